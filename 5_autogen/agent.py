@@ -1,8 +1,9 @@
 from autogen_core import MessageContext, RoutedAgent, message_handler
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 import messages
+from model_pool import get_model_client
+from registry import registry
 import random
 from dotenv import load_dotenv
 
@@ -26,9 +27,11 @@ class Agent(RoutedAgent):
 
     # You can also change the code to make the behavior different, but be careful to keep method signatures the same
 
+    MODEL = "gpt-4o-mini"
+
     def __init__(self, name) -> None:
         super().__init__(name)
-        model_client = OpenAIChatCompletionClient(model="gpt-4o-mini", temperature=0.7)
+        model_client = get_model_client(self.MODEL, temperature=0.7)
         self._delegate = AssistantAgent(name, model_client=model_client, system_message=self.system_message)
 
     @message_handler
@@ -38,8 +41,9 @@ class Agent(RoutedAgent):
         response = await self._delegate.on_messages([text_message], ctx.cancellation_token)
         idea = response.chat_message.content
         if random.random() < self.CHANCES_THAT_I_BOUNCE_IDEA_OFF_ANOTHER:
-            recipient = messages.find_recipient()
+            recipient = messages.find_recipient(exclude=self.id.type)
             message = f"Here is my business idea. It may not be your speciality, but please refine it and make it better. {idea}"
-            response = await self.send_message(messages.Message(content=message), recipient)
+            with registry.busy(recipient.type):
+                response = await self.send_message(messages.Message(content=message), recipient)
             idea = response.content
         return messages.Message(content=idea)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import multiprocessing
+import world
+
+
+def run_once(workers: int, agents: int, results) -> None:
+    results.put(asyncio.run(world.run(workers, agents)).ideas_per_minute())
+
+
+def benchmark_workers(worker_counts: list[int], agents: int) -> list[tuple[int, float]]:
+    """
+    Create the same number of agents with each worker count and compare ideas per minute.
+    Model calls dominate, so raise MODEL_REQUESTS_PER_MINUTE to your real quota or the rate limit sets the pace.
+    Each run gets a fresh launcher process, so pooled clients and rate limits don't carry over between runs.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for workers in worker_counts:
+        queue = context.Queue()
+        process = context.Process(target=run_once, args=(workers, agents, queue))
+        process.start()
+        results.append((workers, queue.get()))
+        process.join()
+    baseline = results[0][1] or 1.0
+    print(f"{'workers':>8} {'ideas/min':>10} {'speedup':>8}")
+    for workers, ideas_per_minute in results:
+        print(f"{workers:>8} {ideas_per_minute:>10.1f} {ideas_per_minute / baseline:>7.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the autogen world with different numbers of worker processes")
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--agents", type=int, default=world.HOW_MANY_AGENTS)
+    args = parser.parse_args()
+    benchmark_workers([int(n) for n in args.workers.split(",")], args.agents)
@@ -1,10 +1,11 @@
 from autogen_core import MessageContext, RoutedAgent, message_handler
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 import messages
+from model_pool import get_model_client
+from loader import load_module, write_audit
+from registry import announce, withdraw
 from autogen_core import TRACE_LOGGER_NAME
-import importlib
 import logging
 from autogen_core import AgentId
 from dotenv import load_dotenv
@@ -34,9 +35,13 @@ class Creator(RoutedAgent):
     """
 
 
+    MODEL = "gpt-4o-mini"
+
     def __init__(self, name) -> None:
         super().__init__(name)
-        model_client = OpenAIChatCompletionClient(model="gpt-4o-mini", temperature=1.0)
+        self.generations = {}
+        self.live = {}
+        model_client = get_model_client(self.MODEL, temperature=1.0)
         self._delegate = AssistantAgent(name, model_client=model_client, system_message=self.system_message)
 
     def get_user_prompt(self):
@@ -49,17 +54,41 @@ class Creator(RoutedAgent):
         return prompt + template   
         
 
-    @message_handler
-    async def handle_my_message_type(self, message: messages.Message, ctx: MessageContext) -> messages.Message:
-        filename = message.content
+    async def create(self, filename: str, ctx: MessageContext) -> str:
+        """Generate, load and register a new version of the agent, and return the agent type it now lives under"""
         agent_name = filename.split(".")[0]
         text_message = TextMessage(content=self.get_user_prompt(), source="user")
         response = await self._delegate.on_messages([text_message], ctx.cancellation_token)
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(response.chat_message.content)
+        source = response.chat_message.content
+        write_audit(filename, source)
         print(f"** Creator has created python code for agent {agent_name} - about to register with Runtime")
-        module = importlib.import_module(agent_name)
-        await module.Agent.register(self.runtime, agent_name, lambda: module.Agent(agent_name))
-        logger.info(f"** Agent {agent_name} is live")
-        result = await self.send_message(messages.Message(content="Give me an idea"), AgentId(agent_name, "default"))
-        return messages.Message(content=result.content)
\ No newline at end of file
+        module = load_module(agent_name, source, filename)
+        # The runtime can't swap the class behind a registered type, so a re-created agent is registered as a new type
+        generation = self.generations.get(agent_name, -1) + 1
+        agent_type = agent_name if generation == 0 else f"{agent_name}_v{generation}"
+        await module.Agent.register(self.runtime, agent_type, lambda: module.Agent(agent_type))
+        self.generations[agent_name] = generation
+        previous = self.live.get(agent_name)
+        self.live[agent_name] = agent_type
+        await announce(self, agent_type)
+        if previous:
+            # The superseded version stays registered with the runtime, but no one should pick it any more
+            await withdraw(self, previous)
+        logger.info(f"** Agent {agent_type} is live")
+        return agent_type
+
+    async def get_idea(self, agent_type: str) -> messages.Message:
+        result = await self.send_message(messages.Message(content="Give me an idea"), AgentId(agent_type, "default"))
+        return messages.Message(content=result.content)
+
+    @message_handler
+    async def handle_my_message_type(self, message: messages.Message, ctx: MessageContext) -> messages.Message:
+        filename = message.content
+        # A retry after a failure further along reuses the agent that is already live, rather than building another
+        agent_type = self.live.get(filename.split(".")[0]) or await self.create(filename, ctx)
+        return await self.get_idea(agent_type)
+
+    @message_handler
+    async def handle_recreate(self, message: messages.RecreateAgent, ctx: MessageContext) -> messages.Message:
+        """Replace a live agent with freshly generated code, without restarting the runtime"""
+        return await self.get_idea(await self.create(message.content, ctx))
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("DEFAULT_REQUESTS_PER_MINUTE", "60"))
+DEFAULT_REQUEST_BURST = int(os.getenv("DEFAULT_REQUEST_BURST", "5"))
+# Comma separated model=requests per minute, e.g. "gpt-4o-mini=500,gpt-4o=100"
+MODEL_REQUESTS_PER_MINUTE = {
+    model.strip(): float(rate)
+    for model, rate in (item.split("=") for item in os.getenv("MODEL_REQUESTS_PER_MINUTE", "").split(",") if "=" in item)
+}
+
+
+class TokenBucket:
+    """Let at most `per_minute` requests start per minute, with bursts up to `burst`"""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.requests = 0
+        self.waited = 0.0
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests += 1
+                    self.waited += now - started
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+buckets: dict[str, TokenBucket] = {}
+# The fraction of each model's budget this process may use, when the agents are spread over several processes
+share = 1.0
+
+
+def rate_limiter(model: str) -> TokenBucket:
+    """The bucket shared by every model client in this process that calls the given model"""
+    if model not in buckets:
+        buckets[model] = TokenBucket(
+            MODEL_REQUESTS_PER_MINUTE.get(model, DEFAULT_REQUESTS_PER_MINUTE) * share, DEFAULT_REQUEST_BURST
+        )
+    return buckets[model]
+
+
+def report() -> str:
+    return "; ".join(
+        f"{model}: {bucket.requests} requests, {bucket.waited:.1f}s waiting for the rate limit"
+        for model, bucket in buckets.items()
+    )
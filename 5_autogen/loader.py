@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import linecache
+import os
+import sys
+import types
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+CODE_CACHE_SIZE = int(os.getenv("CODE_CACHE_SIZE", "256"))
+
+_code: OrderedDict[str, types.CodeType] = OrderedDict()
+_audits: set[asyncio.Task] = set()
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def compile_source(source: str, filename: str) -> types.CodeType:
+    """Compile generated source, reusing the bytecode of any identical source compiled before"""
+    key = source_hash(source)
+    if key in _code:
+        _code.move_to_end(key)
+        return _code[key]
+    code = compile(source, filename, "exec")
+    _code[key] = code
+    if len(_code) > CODE_CACHE_SIZE:
+        _code.popitem(last=False)
+    return code
+
+
+def load_module(name: str, source: str, filename: str | None = None) -> types.ModuleType:
+    """
+    Execute generated source as a brand new module, without touching the filesystem or the import path.
+    The module replaces any earlier one of the same name in sys.modules, so re-creating an agent picks up
+    its new code. Tracebacks still show the source, as if it came from `filename`.
+    """
+    filename = filename or f"{name}.py"
+    code = compile_source(source, filename)
+    linecache.cache[filename] = (len(source), None, source.splitlines(keepends=True), filename)
+    module = types.ModuleType(name)
+    module.__file__ = filename
+    previous = sys.modules.get(name)
+    sys.modules[name] = module
+    try:
+        exec(code, module.__dict__)
+    except BaseException:
+        if previous is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = previous
+        raise
+    return module
+
+
+def write_file(filename: str, source: str) -> None:
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def write_audit(filename: str, source: str) -> asyncio.Task:
+    """Keep a copy of the generated source on disk, in the background; nothing loads it from there"""
+    task = asyncio.create_task(asyncio.to_thread(write_file, filename, source))
+    _audits.add(task)
+    task.add_done_callback(_audits.discard)
+    return task
+
+
+async def flush_audits() -> None:
+    if _audits:
+        await asyncio.gather(*_audits, return_exceptions=True)
@@ -1,24 +1,36 @@
 from dataclasses import dataclass
 from autogen_core import AgentId
-import glob
-import os
 
 
-import random
+REGISTRY_TOPIC_TYPE = "agent_registry"
 
 @dataclass
 class Message:
     content: str
 
 
-def find_recipient() -> AgentId:
-    try:
-        agent_files = glob.glob("agent*.py")
-        agent_names = [os.path.splitext(file)[0] for file in agent_files]
-        agent_names.remove("agent")
-        agent_name = random.choice(agent_names)
-        print(f"Selecting agent for refinement: {agent_name}")
-        return AgentId(agent_name, "default")
-    except Exception as e:
-        print(f"Exception finding recipient: {e}")
+@dataclass
+class RecreateAgent:
+    content: str
+
+
+@dataclass
+class AgentRegistered:
+    agent_type: str
+    weight: float = 1.0
+
+
+@dataclass
+class AgentUnregistered:
+    agent_type: str
+
+
+def find_recipient(exclude: str | None = None) -> AgentId:
+    from registry import registry
+
+    agent_name = registry.choose(exclude)
+    if agent_name is None:
+        print("No registered agents to choose from")
         return AgentId("agent1", "default")
+    print(f"Selecting agent for refinement: {agent_name}")
+    return AgentId(agent_name, "default")
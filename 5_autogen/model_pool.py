@@ -0,0 +1,93 @@
+import os
+import time
+from collections import defaultdict, deque
+import httpx
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from dotenv import load_dotenv
+from limits import rate_limiter
+
+load_dotenv(override=True)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Latencies kept per client for the percentiles
+LATENCY_SAMPLES = int(os.getenv("LATENCY_SAMPLES", "1000"))
+
+
+class ModelMetrics:
+    """Calls, tokens and latency for one pooled client, summed over every agent that shares it"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, q: float) -> float:
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))] if latencies else 0.0
+
+
+class PooledChatCompletionClient(OpenAIChatCompletionClient):
+    """A model client that waits for its model's rate limit before each call and records what the call cost"""
+
+    def __init__(self, model: str, temperature: float, **kwargs):
+        super().__init__(model=model, temperature=temperature, **kwargs)
+        self.model_name = model
+        self.metrics = ModelMetrics()
+
+    async def create(self, *args, **kwargs):
+        await rate_limiter(self.model_name).acquire()
+        started = time.monotonic()
+        try:
+            result = await super().create(*args, **kwargs)
+        except Exception:
+            self.metrics.errors += 1
+            raise
+        finally:
+            self.metrics.calls += 1
+            self.metrics.latencies.append(time.monotonic() - started)
+        self.metrics.prompt_tokens += result.usage.prompt_tokens
+        self.metrics.completion_tokens += result.usage.completion_tokens
+        return result
+
+
+_http_client = None
+_clients: dict[tuple[str, float], PooledChatCompletionClient] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """One keep-alive connection pool for every model client in this process"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+    return _http_client
+
+
+def get_model_client(model: str = "gpt-4o-mini", temperature: float = 0.7) -> PooledChatCompletionClient:
+    """The process-wide client for this model and temperature; agents share it rather than building their own"""
+    key = (model, temperature)
+    if key not in _clients:
+        _clients[key] = PooledChatCompletionClient(model, temperature, http_client=get_http_client())
+    return _clients[key]
+
+
+def report() -> str:
+    totals = defaultdict(int)
+    lines = []
+    for (model, temperature), client in _clients.items():
+        metrics = client.metrics
+        totals["prompt_tokens"] += metrics.prompt_tokens
+        totals["completion_tokens"] += metrics.completion_tokens
+        lines.append(
+            f"{model} t={temperature}: {metrics.calls} calls, {metrics.errors} errors, "
+            f"{metrics.prompt_tokens} in / {metrics.completion_tokens} out tokens, "
+            f"p50 {metrics.percentile(50):.1f}s p95 {metrics.percentile(95):.1f}s"
+        )
+    lines.append(f"{len(_clients)} shared clients, {totals['prompt_tokens']} in / {totals['completion_tokens']} out tokens")
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+import os
+import random
+from contextlib import contextmanager
+from autogen_core import MessageContext, RoutedAgent, TopicId, TypeSubscription, message_handler
+from dotenv import load_dotenv
+import messages
+
+load_dotenv(override=True)
+
+# "least_loaded" picks the less busy of two random agents, "weighted" favours heavier agents, "random" is uniform
+RECIPIENT_SELECTION = os.getenv("RECIPIENT_SELECTION", "least_loaded").strip().lower()
+
+
+class AgentRegistry:
+    """
+    The agent types that are live in the runtime, with O(1) selection.
+
+    Types sit in a list with a dict from type to position, so adding, removing (swap with the last) and
+    uniform picks are all constant time. Weighted picks use rejection sampling against the largest weight,
+    which is expected constant time while weights stay within a small factor of each other. Load counts the
+    requests this process has in flight to each type; least_loaded compares two random types and takes the
+    less busy one, which keeps the load nearly even without scanning every agent.
+    """
+
+    def __init__(self, rng: random.Random | None = None):
+        self.rng = rng or random.Random()
+        self.types: list[str] = []
+        self.index: dict[str, int] = {}
+        self.weights: dict[str, float] = {}
+        self.load: dict[str, int] = {}
+        self.max_weight = 0.0
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __contains__(self, agent_type: str) -> bool:
+        return agent_type in self.index
+
+    def add(self, agent_type: str, weight: float = 1.0) -> None:
+        if agent_type not in self.index:
+            self.index[agent_type] = len(self.types)
+            self.types.append(agent_type)
+            self.load.setdefault(agent_type, 0)
+        self.weights[agent_type] = weight
+        self.max_weight = max(self.max_weight, weight)
+
+    def remove(self, agent_type: str) -> None:
+        position = self.index.pop(agent_type, None)
+        if position is None:
+            return
+        last = self.types.pop()
+        if last != agent_type:
+            self.types[position] = last
+            self.index[last] = position
+        weight = self.weights.pop(agent_type)
+        self.load.pop(agent_type, None)
+        if weight >= self.max_weight:
+            self.max_weight = max(self.weights.values(), default=0.0)
+
+    def random(self, exclude: str | None = None) -> str | None:
+        if not self.types or self.types == [exclude]:
+            return None
+        while True:
+            agent_type = self.types[self.rng.randrange(len(self.types))]
+            if agent_type != exclude:
+                return agent_type
+
+    def weighted(self, exclude: str | None = None) -> str | None:
+        if self.max_weight <= 0:
+            return self.random(exclude)
+        for _ in range(8 * len(self.types)):
+            agent_type = self.random(exclude)
+            if agent_type is None or self.rng.random() * self.max_weight < self.weights[agent_type]:
+                return agent_type
+        return self.random(exclude)
+
+    def least_loaded(self, exclude: str | None = None) -> str | None:
+        first, second = self.random(exclude), self.random(exclude)
+        if first is None:
+            return None
+        return first if self.load[first] <= self.load[second] else second
+
+    def choose(self, exclude: str | None = None, policy: str = RECIPIENT_SELECTION) -> str | None:
+        if policy == "random":
+            return self.random(exclude)
+        if policy == "weighted":
+            return self.weighted(exclude)
+        return self.least_loaded(exclude)
+
+    @contextmanager
+    def busy(self, agent_type: str):
+        """Count a request to this agent type as in flight until the block exits"""
+        self.load[agent_type] = self.load.get(agent_type, 0) + 1
+        try:
+            yield
+        finally:
+            if agent_type in self.load:
+                self.load[agent_type] -= 1
+
+
+registry = AgentRegistry()
+REGISTRY_TOPIC = TopicId(messages.REGISTRY_TOPIC_TYPE, "default")
+
+
+class RegistryAgent(RoutedAgent):
+    """Keeps this process's registry in step with agents registered anywhere in the runtime"""
+
+    @message_handler
+    async def on_registered(self, message: messages.AgentRegistered, ctx: MessageContext) -> None:
+        registry.add(message.agent_type, message.weight)
+
+    @message_handler
+    async def on_unregistered(self, message: messages.AgentUnregistered, ctx: MessageContext) -> None:
+        registry.remove(message.agent_type)
+
+
+async def start_registry(runtime, name: str = "registry") -> None:
+    """
+    Subscribe this runtime to registry broadcasts, under an agent type of its own so that every worker gets a copy.
+    Workers must start before agents are created, since a registry only hears of agents announced after it starts.
+    """
+    await RegistryAgent.register(runtime, name, lambda: RegistryAgent(name))
+    await runtime.add_subscription(TypeSubscription(topic_type=messages.REGISTRY_TOPIC_TYPE, agent_type=name))
+
+
+async def announce(agent: RoutedAgent, agent_type: str, weight: float = 1.0) -> None:
+    """Add a newly registered agent type here at once, and tell every other registry in the runtime"""
+    registry.add(agent_type, weight)
+    await agent.publish_message(messages.AgentRegistered(agent_type=agent_type, weight=weight), REGISTRY_TOPIC)
+
+
+async def withdraw(agent: RoutedAgent, agent_type: str) -> None:
+    """Stop every registry in the runtime from choosing this agent type, e.g. once a newer version replaces it"""
+    registry.remove(agent_type)
+    await agent.publish_message(messages.AgentUnregistered(agent_type=agent_type), REGISTRY_TOPIC)
@@ -2,34 +2,220 @@ from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
 from agent import Agent
 from creator import Creator
 from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
-from autogen_core import AgentId
+from autogen_core import AgentId, try_get_known_serializers_for_type
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+import itertools
+import multiprocessing
+import limits
+import loader
+import model_pool
+from registry import registry, start_registry
 import messages
 import asyncio
+import os
+import random
+import time
+import uuid
 
-HOW_MANY_AGENTS = 20
+load_dotenv(override=True)
 
-async def create_and_message(worker, creator_id, i: int):
-    try:
-        result = await worker.send_message(messages.Message(content=f"agent{i}.py"), creator_id)
-        with open(f"idea{i}.md", "w") as f:
-            f.write(result.content)
-    except Exception as e:
-        print(f"Failed to run worker {i} due to exception: {e}")
+HOW_MANY_AGENTS = int(os.getenv("HOW_MANY_AGENTS", "20"))
+# How many agents each Creator is building at once; the rest wait their turn
+SPAWN_CONCURRENCY = int(os.getenv("SPAWN_CONCURRENCY", "5"))
+SPAWN_RETRIES = int(os.getenv("SPAWN_RETRIES", "3"))
+SPAWN_BACKOFF_SECONDS = float(os.getenv("SPAWN_BACKOFF_SECONDS", "2"))
+HOST_ADDRESS = os.getenv("HOST_ADDRESS", "localhost:50051")
+# Worker processes, each with its own Creator and event loop; 1 runs everything in this process as before
+WORKERS = int(os.getenv("WORKERS", "1"))
+# "least_loaded" sends each new agent to the Creator with the fewest creations in flight, "round_robin" takes turns
+PLACEMENT = os.getenv("PLACEMENT", "least_loaded").strip().lower()
+# After the first round, re-create this many of the agents with new code, to exercise hot re-creation
+RECREATE_AGENTS = int(os.getenv("RECREATE_AGENTS", "0"))
 
-async def main():
-    host = GrpcWorkerAgentRuntimeHost(address="localhost:50051")
-    host.start() 
-    worker = GrpcWorkerAgentRuntime(host_address="localhost:50051")
+
+@dataclass
+class SpawnStats:
+    total: int
+    started: float = field(default_factory=time.monotonic)
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    durations: list[float] = field(default_factory=list)
+    placed: Counter = field(default_factory=Counter)
+    finished: float | None = None
+
+    def ideas_per_minute(self) -> float:
+        minutes = ((self.finished or time.monotonic()) - self.started) / 60
+        return self.succeeded / minutes if minutes else 0.0
+
+    def progress(self) -> str:
+        done = self.succeeded + self.failed
+        durations = sorted(self.durations)
+        p50 = durations[len(durations) // 2] if durations else 0.0
+        return (
+            f"{done}/{self.total} agents done, {self.failed} failed, {self.retries} retries, "
+            f"{self.ideas_per_minute():.1f} agents/min, p50 {p50:.1f}s"
+        )
+
+
+class Placement:
+    """
+    Decide which worker's Creator builds each new agent, and so which process the agent lives in.
+    An agent stays with its Creator, so retries and re-creations go to the one that already has it.
+    """
+
+    def __init__(self, creator_types: list[str], policy: str = PLACEMENT):
+        self.creator_types = creator_types
+        self.policy = policy
+        self.in_flight = Counter({creator_type: 0 for creator_type in creator_types})
+        self.turns = itertools.cycle(creator_types)
+        self.owners: dict[int, str] = {}
+
+    @contextmanager
+    def assign(self, i: int):
+        if i in self.owners:
+            creator_type = self.owners[i]
+        elif self.policy == "round_robin":
+            creator_type = next(self.turns)
+        else:
+            creator_type = min(self.creator_types, key=lambda creator_type: self.in_flight[creator_type])
+        self.owners[i] = creator_type
+        self.in_flight[creator_type] += 1
+        try:
+            yield AgentId(creator_type, "default")
+        finally:
+            self.in_flight[creator_type] -= 1
+
+
+class WorkerRuntime(GrpcWorkerAgentRuntime):
+    """
+    A worker runtime whose request ids are unique across workers.
+    The host files pending responses under the target worker and the request id alone, and each runtime counts
+    request ids from 1, so two workers calling agents in the same third worker would overwrite each other's
+    pending response, and one of the callers would wait forever.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._request_prefix = uuid.uuid4().hex
+
+    async def _get_new_request_id(self) -> str:
+        return f"{self._request_prefix}-{await super()._get_new_request_id()}"
+
+
+def backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter, so agents that failed together don't retry together"""
+    return random.uniform(0, SPAWN_BACKOFF_SECONDS * 2**attempt)
+
+
+def write_idea(i: int, content: str) -> None:
+    with open(f"idea{i}.md", "w") as f:
+        f.write(content)
+
+
+async def create_and_message(
+    worker, placement: Placement, i: int, window: asyncio.Semaphore, stats: SpawnStats, request=messages.Message
+):
+    async with window:
+        for attempt in range(SPAWN_RETRIES + 1):
+            started = time.monotonic()
+            try:
+                with placement.assign(i) as creator_id:
+                    result = await worker.send_message(request(content=f"agent{i}.py"), creator_id)
+                await asyncio.to_thread(write_idea, i, result.content)
+                stats.succeeded += 1
+                stats.placed[creator_id.type] += 1
+                stats.durations.append(time.monotonic() - started)
+                break
+            except Exception as e:
+                if attempt == SPAWN_RETRIES:
+                    stats.failed += 1
+                    print(f"Failed to run worker {i} due to exception: {e}")
+                    break
+                stats.retries += 1
+                delay = backoff(attempt)
+                print(f"Worker {i} failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    print(stats.progress())
+
+async def serve_worker(n: int, workers: int, ready, stop) -> None:
+    """One worker process: its own runtime, registry and Creator, serving until the launcher says stop"""
+    limits.share = 1 / workers
+    worker = WorkerRuntime(host_address=HOST_ADDRESS)
     await worker.start()
-    result = await Creator.register(worker, "Creator", lambda: Creator("Creator"))
-    creator_id = AgentId("Creator", "default")
-    coroutines = [create_and_message(worker, creator_id, i) for i in range(1, HOW_MANY_AGENTS+1)]
+    await start_registry(worker, f"registry_{n}")
+    await Creator.register(worker, f"Creator_{n}", lambda: Creator(f"Creator_{n}"))
+    ready.set()
+    await asyncio.to_thread(stop.wait)
+    await loader.flush_audits()
+    print(f"Worker {n}: {len(registry)} agents in its registry; model calls: {limits.report()}\n{model_pool.report()}")
+    await worker.stop()
+
+
+def run_worker(n: int, workers: int, ready, stop) -> None:
+    asyncio.run(serve_worker(n, workers, ready, stop))
+
+
+async def run(workers: int = WORKERS, how_many: int = HOW_MANY_AGENTS) -> SpawnStats:
+    host = GrpcWorkerAgentRuntimeHost(address=HOST_ADDRESS)
+    host.start()
+    worker = WorkerRuntime(host_address=HOST_ADDRESS)
+    await worker.start()
+    processes = []
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    if workers <= 1:
+        await start_registry(worker)
+        await Creator.register(worker, "Creator", lambda: Creator("Creator"))
+        creator_types = ["Creator"]
+    else:
+        readies = [context.Event() for _ in range(workers)]
+        processes = [context.Process(target=run_worker, args=(n, workers, readies[n], stop)) for n in range(workers)]
+        for process in processes:
+            process.start()
+        for ready in readies:
+            await asyncio.to_thread(ready.wait)
+        creator_types = [f"Creator_{n}" for n in range(workers)]
+        # The launcher hosts no agents, so nothing else has told its runtime how to (de)serialize a Message
+        worker.add_message_serializer(try_get_known_serializers_for_type(messages.Message))
+        worker.add_message_serializer(try_get_known_serializers_for_type(messages.RecreateAgent))
+    placement = Placement(creator_types)
+    window = asyncio.Semaphore(SPAWN_CONCURRENCY * len(creator_types))
+    stats = SpawnStats(how_many)
+    coroutines = [create_and_message(worker, placement, i, window, stats) for i in range(1, how_many+1)]
     await asyncio.gather(*coroutines)
+    stats.finished = time.monotonic()
+    await loader.flush_audits()
+    print(f"Finished: {stats.progress()}")
+    print(f"Placed: {dict(stats.placed)}")
+    if RECREATE_AGENTS:
+        recreated = SpawnStats(min(RECREATE_AGENTS, how_many))
+        coroutines = [
+            create_and_message(worker, placement, i, window, recreated, messages.RecreateAgent)
+            for i in range(1, recreated.total + 1)
+        ]
+        await asyncio.gather(*coroutines)
+        recreated.finished = time.monotonic()
+        await loader.flush_audits()
+        print(f"Re-created: {recreated.progress()}")
+    if workers <= 1:
+        print(f"Model calls: {limits.report()}\n{model_pool.report()}")
+    stop.set()
+    for process in processes:
+        await asyncio.to_thread(process.join)
     try:
         await worker.stop()
         await host.stop()
     except Exception as e:
         print(e)
+    return stats
+
+
+async def main():
+    await run()
 
 
 
@@ -37,4 +223,3 @@ async def main():
 if __name__ == "__main__":
     asyncio.run(main())
 
-
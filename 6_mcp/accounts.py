@@ -1,14 +1,33 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from typing import Literal
 import json
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+import os
+import clock
+from market import get_share_prices
+from database import (
+    StaleAccountError,
+    transaction,
+    write_account,
+    read_account,
+    write_log,
+    append_transaction,
+    read_transactions,
+    read_recent_transactions,
+    read_last_transaction_id,
+    count_transactions_since,
+    append_portfolio_value,
+    read_portfolio_series,
+    clear_account_history,
+    SERIES_MAX_POINTS,
+)
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+REPORT_RECENT_TRANSACTIONS = int(os.getenv("REPORT_RECENT_TRANSACTIONS", "10"))
+REPORT_RATIONALE_CHARS = int(os.getenv("REPORT_RATIONALE_CHARS", "160"))
 
 
 class Transaction(BaseModel):
@@ -25,13 +44,30 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    side: Literal["buy", "sell"]
+    symbol: str
+    quantity: int
+    rationale: str
+
+
 class Account(BaseModel):
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    cost_basis: dict[str, float] = {}
+    net_invested: float = 0.0
+    realized_pnl: float = 0.0
+    version: int | None = None
+    trade_count: int = 0
+    buy_count: int = 0
+    sell_count: int = 0
+    first_trade: str | None = None
+    last_trade: str | None = None
+    _transactions: list[Transaction] | None = PrivateAttr(default=None)
 
     @classmethod
     def get(cls, name: str):
@@ -42,22 +78,91 @@ class Account(BaseModel):
                 "balance": INITIAL_BALANCE,
                 "strategy": "",
                 "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
             }
-            write_account(name, fields)
+            fields["version"] = write_account(name, fields)
+        if fields.get("net_invested", 0.0) is None or fields.get("trade_count", 0) is None:
+            account = cls(**{field: value for field, value in fields.items() if value is not None})
+            account.rebuild_aggregates()
+            account.save()
+            return account
         return cls(**fields)
-    
-    
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        """ The transaction history, loaded from the database on first use. """
+        if self._transactions is None:
+            self._transactions = [Transaction(**row) for row in read_transactions(self.name)]
+        return self._transactions
+
+    @property
+    def portfolio_value_time_series(self) -> list[tuple[str, float]]:
+        """ The whole portfolio value history, downsampled to a chart-ready size. """
+        return self.get_portfolio_value_series()
+
+    def get_portfolio_value_series(self, since: str | None = None, max_points: int = SERIES_MAX_POINTS) -> list[tuple[str, float]]:
+        """ The portfolio value history since the given "YYYY-MM-DD HH:MM:SS", downsampled to at most max_points. """
+        return read_portfolio_series(self.name, since, max_points)
+
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Write the account, failing with StaleAccountError if it has changed since it was read. """
+        try:
+            self.version = write_account(self.name.lower(), self.model_dump())
+        except StaleAccountError:
+            # Drop the unsaved changes, so the account matches what is stored
+            self.refresh(read_account(self.name))
+            raise
+
+    def refresh(self, fields: dict):
+        """ Update the account to the stored fields, dropping the loaded history if someone else has written since. """
+        if fields.get("version") != self.version:
+            self._transactions = None
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    def record_portfolio_value(self, portfolio_value: float):
+        append_portfolio_value(self.name, clock.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value)
+
+    def apply_trade(self, symbol: str, quantity: int, price: float, timestamp: str):
+        """ Update the holdings, running P&L aggregates and trade stats for a trade; quantity is negative for a sale. """
+        self.trade_count += 1
+        if quantity > 0:
+            self.buy_count += 1
+        else:
+            self.sell_count += 1
+        self.first_trade = self.first_trade or timestamp
+        self.last_trade = timestamp
+        held = self.holdings.get(symbol, 0)
+        if quantity > 0:
+            self.cost_basis[symbol] = (held * self.cost_basis.get(symbol, 0.0) + quantity * price) / (held + quantity)
+        else:
+            self.realized_pnl += -quantity * (price - self.cost_basis.get(symbol, price))
+        self.net_invested += quantity * price
+        self.holdings[symbol] = held + quantity
+        # If shares are completely sold, remove from holdings
+        if self.holdings[symbol] == 0:
+            del self.holdings[symbol]
+            self.cost_basis.pop(symbol, None)
+
+    def rebuild_aggregates(self):
+        """ Recompute the running P&L aggregates and trade stats by replaying the transaction history. """
+        holdings = self.holdings
+        self.holdings, self.cost_basis, self.net_invested, self.realized_pnl = {}, {}, 0.0, 0.0
+        self.trade_count, self.buy_count, self.sell_count, self.first_trade, self.last_trade = 0, 0, 0, None, None
+        for tx in self.transactions:
+            self.apply_trade(tx.symbol, tx.quantity, tx.price, tx.timestamp)
+        self.holdings = holdings
+        self.cost_basis = {symbol: cost for symbol, cost in self.cost_basis.items() if symbol in holdings}
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
+        self.cost_basis = {}
+        self.net_invested = 0.0
+        self.realized_pnl = 0.0
+        self.trade_count, self.buy_count, self.sell_count, self.first_trade, self.last_trade = 0, 0, 0, None, None
+        clear_account_history(self.name)
+        self._transactions = []
         self.save()
 
     def deposit(self, amount: float):
@@ -78,65 +183,78 @@ class Account(BaseModel):
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
-        price = get_share_price(symbol)
-        buy_price = price * (1 + SPREAD)
-        total_cost = buy_price * quantity
-        
-        if total_cost > self.balance:
-            raise ValueError("Insufficient funds to buy shares.")
-        elif price==0:
-            raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
-        write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return self.execute_orders([Order(side="buy", symbol=symbol, quantity=quantity, rationale=rationale)])
 
     def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Sell shares of a stock if the user has enough shares. """
-        if self.holdings.get(symbol, 0) < quantity:
-            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
-        
-        price = get_share_price(symbol)
-        sell_price = price * (1 - SPREAD)
-        total_proceeds = sell_price * quantity
-        
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
-        if self.holdings[symbol] == 0:
-            del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
+        return self.execute_orders([Order(side="sell", symbol=symbol, quantity=quantity, rationale=rationale)])
 
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
-        write_log(self.name, "account", f"Sold {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+    def fill(self, order: Order, price: float) -> Transaction:
+        """ Apply one order at the given market price to this account in memory, and return its transaction. """
+        if order.quantity <= 0:
+            raise ValueError(f"Cannot {order.side} {order.quantity} shares of {order.symbol}. Quantity must be positive.")
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        if order.side == "buy":
+            buy_price = price * (1 + SPREAD)
+            total_cost = buy_price * order.quantity
+            if total_cost > self.balance:
+                raise ValueError("Insufficient funds to buy shares.")
+            elif price==0:
+                raise ValueError(f"Unrecognized symbol {order.symbol}")
+            self.apply_trade(order.symbol, order.quantity, buy_price, timestamp)
+            self.balance -= total_cost
+            quantity, trade_price = order.quantity, buy_price
+        else:
+            if self.holdings.get(order.symbol, 0) < order.quantity:
+                raise ValueError(f"Cannot sell {order.quantity} shares of {order.symbol}. Not enough shares held.")
+            sell_price = price * (1 - SPREAD)
+            self.apply_trade(order.symbol, -order.quantity, sell_price, timestamp)
+            self.balance += sell_price * order.quantity
+            quantity, trade_price = -order.quantity, sell_price  # negative quantity for sell
+        return Transaction(symbol=order.symbol, quantity=quantity, price=trade_price, timestamp=timestamp, rationale=order.rationale)
+
+    def execute_orders(self, orders: list[Order], prices: dict[str, float] | None = None) -> str:
+        """
+        Execute the orders in sequence as a single database transaction: either all of them are filled or none are.
+        The account is re-read under the write lock, so trades made concurrently on the same account are never lost.
+        Prices are looked up unless they are given.
+        """
+        prices = prices or get_share_prices({order.symbol for order in orders})
+        try:
+            with transaction() as cursor:
+                self.refresh(read_account(self.name, cursor))
+                fills = [self.fill(order, prices.get(order.symbol, 0.0)) for order in orders]
+                self.version = write_account(self.name, self.model_dump(), cursor)
+                for fill in fills:
+                    append_transaction(self.name, fill.model_dump(), cursor)
+        except Exception:
+            self.refresh(read_account(self.name))
+            raise
+        if self._transactions is not None:
+            self._transactions.extend(fills)
+        for order in orders:
+            write_log(self.name, "account", f"{'Bought' if order.side == 'buy' else 'Sold'} {order.quantity} of {order.symbol}")
+        return "Completed. Latest details:\n" + self.summary_report()
 
     def calculate_portfolio_value(self):
         """ Calculate the total value of the user's portfolio. """
         total_value = self.balance
+        prices = get_share_prices(self.holdings)
         for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
+            total_value += prices[symbol] * quantity
         return total_value
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        return portfolio_value - self.net_invested - self.balance
+
+    def calculate_position_profit_loss(self, prices: dict[str, float] | None = None) -> dict[str, float]:
+        """ Calculate the unrealized profit or loss of each holding against its average cost. """
+        prices = prices or get_share_prices(self.holdings)
+        return {
+            symbol: (prices[symbol] - self.cost_basis.get(symbol, 0.0)) * quantity
+            for symbol, quantity in self.holdings.items()
+        }
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,7 +262,7 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
         """ List all transactions made by the user. """
@@ -153,15 +271,80 @@ class Account(BaseModel):
     def report(self) -> str:
         """ Return a json string representing the account.  """
         portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
+        self.record_portfolio_value(portfolio_value)
         pnl = self.calculate_profit_loss(portfolio_value)
-        data = self.model_dump()
+        data = self.model_dump(exclude={"version"})
+        data["transactions"] = self.list_transactions()
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
+    def compact_transactions(self, transactions: list[dict]) -> list[dict]:
+        return [
+            {
+                **transaction,
+                "price": round(transaction["price"], 2),
+                "rationale": transaction["rationale"][:REPORT_RATIONALE_CHARS],
+            }
+            for transaction in transactions
+        ]
+
+    def snapshot(self) -> dict:
+        """ The current state of the account: cash, each position with its cost and value, and overall P&L. """
+        prices = get_share_prices(self.holdings)
+        portfolio_value = self.balance + sum(prices[symbol] * quantity for symbol, quantity in self.holdings.items())
+        self.record_portfolio_value(portfolio_value)
+        pnl = self.calculate_position_profit_loss(prices)
+        return {
+            "name": self.name,
+            "balance": round(self.balance, 2),
+            "holdings": {
+                symbol: {
+                    "quantity": quantity,
+                    "avg_cost": round(self.cost_basis.get(symbol, 0.0), 2),
+                    "price": round(prices[symbol], 2),
+                    "unrealized_pnl": round(pnl[symbol], 2),
+                }
+                for symbol, quantity in self.holdings.items()
+            },
+            "total_portfolio_value": round(portfolio_value, 2),
+            "total_profit_loss": round(self.calculate_profit_loss(portfolio_value), 2),
+            "realized_pnl": round(self.realized_pnl, 2),
+        }
+
+    def summary_report(self, recent: int = REPORT_RECENT_TRANSACTIONS) -> str:
+        """
+        Return a json string summarizing the account: the current snapshot, aggregate trading stats and the most
+        recent transactions. Its size and cost depend on the number of positions, not on the length of the history.
+        """
+        data = self.snapshot()
+        data["last_transaction_id"] = read_last_transaction_id(self.name)
+        data["stats"] = {
+            "transactions": self.trade_count,
+            "buys": self.buy_count,
+            "sells": self.sell_count,
+            "first_trade": self.first_trade,
+            "last_trade": self.last_trade,
+        }
+        data["recent_transactions"] = self.compact_transactions(read_recent_transactions(self.name, recent))
+        write_log(self.name, "account", f"Retrieved account summary")
+        return json.dumps(data)
+
+    def delta_report(self, since_transaction_id: int, recent: int = REPORT_RECENT_TRANSACTIONS) -> str:
+        """
+        Return a json string with the current snapshot and only what has changed since the given transaction id:
+        the transactions made since then (at most `recent` of them) and how many there were.
+        """
+        data = self.snapshot()
+        data["last_transaction_id"] = read_last_transaction_id(self.name) or since_transaction_id
+        data["transactions_since_last_report"] = count_transactions_since(self.name, since_transaction_id)
+        data["new_transactions"] = self.compact_transactions(
+            read_recent_transactions(self.name, recent, since_transaction_id)
+        )
+        write_log(self.name, "account", f"Retrieved account changes")
+        return json.dumps(data)
+
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
         write_log(self.name, "account", f"Retrieved strategy")
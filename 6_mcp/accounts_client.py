@@ -1,50 +1,160 @@
 import mcp
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
+from mcp.shared.exceptions import McpError
 from agents import FunctionTool
+from agents.strict_schema import ensure_strict_json_schema
+from dotenv import load_dotenv
+import anyio
+import asyncio
 import json
+import os
+import sys
+
+load_dotenv(override=True)
 
 params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
 
+ACCOUNTS_CLIENT_IN_PROCESS = os.getenv("ACCOUNTS_CLIENT_IN_PROCESS", "false").strip().lower() == "true"
+
+
+class AccountsClient:
+    """
+    A persistent session with the accounts server, started on first use and restarted if the server goes away.
+
+    The session is held open by a background task, so concurrent callers share it (MCP matches
+    responses to requests by id) and it can be closed from any task.
+    """
+
+    def __init__(self, params: StdioServerParameters):
+        self.params = params
+        self.session: mcp.ClientSession | None = None
+        self._loop = None
+        self._task = None
+
+    async def _serve(self, ready: asyncio.Event, stop: asyncio.Event):
+        try:
+            async with stdio_client(self.params) as streams:
+                async with mcp.ClientSession(*streams) as session:
+                    await session.initialize()
+                    self.session = session
+                    ready.set()
+                    await stop.wait()
+        finally:
+            self.session = None
+            ready.set()
+
+    async def connect(self) -> mcp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (e.g. a second asyncio.run) can't use a session opened on the old one
+            self._loop, self._lock, self._task, self.session = loop, asyncio.Lock(), None, None
+        async with self._lock:
+            if self.session is None:
+                ready, self._stop = asyncio.Event(), asyncio.Event()
+                self._task = asyncio.create_task(self._serve(ready, self._stop))
+                await ready.wait()
+                if self.session is None:
+                    await self._task
+                    raise ConnectionError("The accounts server closed before the session was initialized")
+            return self.session
+
+    async def close(self) -> None:
+        if self._task and self._loop is asyncio.get_running_loop():
+            self._stop.set()
+            try:
+                await self._task
+            except Exception as e:
+                print(f"Error closing accounts session: {e}")
+        self._task = None
+        self.session = None
+
+    async def request(self, send):
+        """Run send(session), reconnecting and retrying once if the connection has been lost"""
+        for attempt in range(2):
+            session = await self.connect()
+            try:
+                return await send(session)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError, McpError) as e:
+                lost = not isinstance(e, McpError) or e.error.code == mcp.types.CONNECTION_CLOSED
+                if attempt or not lost:
+                    raise
+                await self.close()
+
+    async def list_tools(self):
+        return (await self.request(lambda session: session.list_tools())).tools
+
+    async def call_tool(self, tool_name, tool_args):
+        return await self.request(lambda session: session.call_tool(tool_name, tool_args))
+
+    async def read_resource(self, uri: str) -> str:
+        result = await self.request(lambda session: session.read_resource(uri))
+        return result.contents[0].text
+
+
+client = AccountsClient(params)
+
+
+def in_process_server():
+    """The accounts_server module, if it is loaded in this interpreter, so that calls can skip MCP"""
+    if ACCOUNTS_CLIENT_IN_PROCESS:
+        import accounts_server  # noqa: F401
+    return sys.modules.get("accounts_server")
+
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    server = in_process_server()
+    if server:
+        return await server.mcp.list_tools()
+    return await client.list_tools()
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    server = in_process_server()
+    if server:
+        try:
+            content = await server.mcp.call_tool(tool_name, tool_args)
+        except Exception as e:
+            return mcp.types.CallToolResult(content=[mcp.types.TextContent(type="text", text=str(e))], isError=True)
+        if isinstance(content, tuple):
+            content = content[0]
+        return mcp.types.CallToolResult(content=list(content))
+    return await client.call_tool(tool_name, tool_args)
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    server = in_process_server()
+    if server:
+        return await server.read_account_resource(name)
+    return await client.read_resource(f"accounts://accounts_server/{name}")
+
+async def read_summary_resource(name):
+    server = in_process_server()
+    if server:
+        return await server.read_summary_resource(name)
+    return await client.read_resource(f"accounts://summary/{name}")
+
+async def read_delta_resource(name, since_transaction_id):
+    server = in_process_server()
+    if server:
+        return await server.read_delta_resource(name, str(since_transaction_id))
+    return await client.read_resource(f"accounts://delta/{name}/{since_transaction_id}")
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    server = in_process_server()
+    if server:
+        return await server.read_strategy_resource(name)
+    return await client.read_resource(f"accounts://strategy/{name}")
 
 async def get_accounts_tools_openai():
     openai_tools = []
     for tool in await list_accounts_tools():
-        schema = {**tool.inputSchema, "additionalProperties": False}
+        # Strict mode needs additionalProperties false and every property required on nested objects too, like $defs
+        schema = ensure_strict_json_schema({**tool.inputSchema, "additionalProperties": False})
         openai_tool = FunctionTool(
             name=tool.name,
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
@@ -1,8 +1,22 @@
+import asyncio
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, Order
+from market import aget_share_prices
 
 mcp = FastMCP("accounts_server")
 
+# SQLite calls run on worker threads and prices are fetched with the async HTTP client,
+# so one slow request or write never holds up the other tool calls being served.
+
+async def get_account(name: str) -> Account:
+    return await asyncio.to_thread(Account.get, name)
+
+async def trade(name: str, orders: list[Order]) -> str:
+    account = await get_account(name)
+    # Price the rest of the holdings too, so the report that follows the trade finds them in the quote cache
+    prices = await aget_share_prices([order.symbol for order in orders] + list(account.holdings))
+    return await asyncio.to_thread(account.execute_orders, orders, prices)
+
 @mcp.tool()
 async def get_balance(name: str) -> float:
     """Get the cash balance of the given account name.
@@ -10,7 +24,7 @@ async def get_balance(name: str) -> float:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return (await get_account(name)).balance
 
 @mcp.tool()
 async def get_holdings(name: str) -> dict[str, int]:
@@ -19,7 +33,7 @@ async def get_holdings(name: str) -> dict[str, int]:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return (await get_account(name)).holdings
 
 @mcp.tool()
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
@@ -31,7 +45,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return await trade(name, [Order(side="buy", symbol=symbol, quantity=quantity, rationale=rationale)])
 
 
 @mcp.tool()
@@ -44,7 +58,18 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return await trade(name, [Order(side="sell", symbol=symbol, quantity=quantity, rationale=rationale)])
+
+@mcp.tool()
+async def execute_orders(name: str, orders: list[Order]) -> str:
+    """Buy and sell several stocks at once, for example to rebalance. The orders are executed in sequence,
+    and either all of them are filled or, if any one fails, none are. Put sells first to free up cash for buys.
+
+    Args:
+        name: The name of the account holder
+        orders: The orders, each with a side ("buy" or "sell"), symbol, quantity and rationale
+    """
+    return await trade(name, orders)
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,17 +79,31 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    account = await get_account(name)
+    return await asyncio.to_thread(account.change_strategy, strategy)
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.report()
+    account = await get_account(name.lower())
+    await aget_share_prices(account.holdings)
+    return await asyncio.to_thread(account.report)
+
+@mcp.resource("accounts://summary/{name}")
+async def read_summary_resource(name: str) -> str:
+    account = await get_account(name.lower())
+    await aget_share_prices(account.holdings)
+    return await asyncio.to_thread(account.summary_report)
+
+@mcp.resource("accounts://delta/{name}/{since_transaction_id}")
+async def read_delta_resource(name: str, since_transaction_id: str) -> str:
+    account = await get_account(name.lower())
+    await aget_share_prices(account.holdings)
+    return await asyncio.to_thread(account.delta_report, int(since_transaction_id))
 
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.get_strategy()
+    account = await get_account(name.lower())
+    return await asyncio.to_thread(account.get_strategy)
 
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
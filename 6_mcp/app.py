@@ -1,10 +1,15 @@
 import gradio as gr
+import asyncio
+import os
+import threading
+from collections import deque
 from util import css, js, Color
 import pandas as pd
-from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from database import read_log_since, read_recent_transactions, read_traders
+from metrics import run_summary, span_summary, since_hours
+from notifications import watcher
 
 mapper = {
     "trace": Color.WHITE,
@@ -15,6 +20,13 @@ mapper = {
     "account": Color.RED,
 }
 
+LOG_LINES = 13
+TRANSACTION_ROWS = int(os.getenv("DASHBOARD_TRANSACTION_ROWS", "50"))
+REVALUE_SECONDS = 120
+TRADERS_PER_ROW = 4
+DASHBOARD_MAX_TRADERS = int(os.getenv("DASHBOARD_MAX_TRADERS", "16"))
+METRICS_WINDOW_HOURS = float(os.getenv("METRICS_WINDOW_HOURS", "24"))
+
 
 class Trader:
     def __init__(self, name: str, lastname: str, model_name: str):
@@ -22,6 +34,9 @@ class Trader:
         self.lastname = lastname
         self.model_name = model_name
         self.account = Account.get(name)
+        self.last_log_id = 0
+        self.log_lines = deque(maxlen=LOG_LINES)
+        self.log_lock = threading.Lock()
 
     def reload(self):
         self.account = Account.get(self.name)
@@ -57,20 +72,29 @@ class Trader:
         """Convert holdings to DataFrame for display"""
         holdings = self.account.get_holdings()
         if not holdings:
-            return pd.DataFrame(columns=["Symbol", "Quantity"])
+            return pd.DataFrame(columns=["Symbol", "Quantity", "Avg Cost", "P&L"])
 
+        pnl = self.account.calculate_position_profit_loss()
         df = pd.DataFrame(
-            [{"Symbol": symbol, "Quantity": quantity} for symbol, quantity in holdings.items()]
+            [
+                {
+                    "Symbol": symbol,
+                    "Quantity": quantity,
+                    "Avg Cost": round(self.account.cost_basis.get(symbol, 0.0), 2),
+                    "P&L": round(pnl[symbol], 2),
+                }
+                for symbol, quantity in holdings.items()
+            ]
         )
         return df
 
     def get_transactions_df(self) -> pd.DataFrame:
-        """Convert transactions to DataFrame for display"""
-        transactions = self.account.list_transactions()
+        """The most recent transactions as a DataFrame for display, without loading the whole history"""
+        transactions = read_recent_transactions(self.name, TRANSACTION_ROWS)
         if not transactions:
             return pd.DataFrame(columns=["Timestamp", "Symbol", "Quantity", "Price", "Rationale"])
 
-        return pd.DataFrame(transactions)
+        return pd.DataFrame(transactions).drop(columns=["id"])
 
     def get_portfolio_value(self) -> str:
         """Calculate total portfolio value based on current prices"""
@@ -80,17 +104,15 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
-    def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
-        response = ""
-        for log in logs:
-            timestamp, type, message = log
-            color = mapper.get(type, Color.WHITE).value
-            response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
-        if response != previous:
-            return response
-        return gr.update()
+    def get_logs(self) -> str:
+        with self.log_lock:
+            logs = read_log_since(self.name, self.last_log_id, last_n=LOG_LINES)
+            for log in logs:
+                log_id, timestamp, type, message = log
+                color = mapper.get(type, Color.WHITE).value
+                self.log_lines.append(f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>")
+                self.last_log_id = log_id
+            return f"<div style='height:250px; overflow-y:auto;'>{''.join(self.log_lines)}</div>"
 
 
 class TraderView:
@@ -116,9 +138,9 @@ class TraderView:
                 self.holdings_table = gr.Dataframe(
                     value=self.trader.get_holdings_df,
                     label="Holdings",
-                    headers=["Symbol", "Quantity"],
+                    headers=["Symbol", "Quantity", "Avg Cost", "P&L"],
                     row_count=(5, "dynamic"),
-                    col_count=2,
+                    col_count=4,
                     max_height=300,
                     elem_classes=["dataframe-fix-small"],
                 )
@@ -133,54 +155,179 @@ class TraderView:
                     elem_classes=["dataframe-fix"],
                 )
 
-        timer = gr.Timer(value=120)
-        timer.tick(
-            fn=self.refresh,
-            inputs=[],
-            outputs=[
-                self.portfolio_value,
-                self.chart,
-                self.holdings_table,
-                self.transactions_table,
-            ],
-            show_progress="hidden",
-            queue=False,
+    def outputs(self) -> list:
+        return [
+            self.portfolio_value,
+            self.chart,
+            self.log,
+            self.holdings_table,
+            self.transactions_table,
+        ]
+
+    def refresh(self, topics: set[str]) -> tuple:
+        """Rebuild only the panels affected by the changed topics; the rest are left as they are"""
+        if "account" in topics:
+            self.trader.reload()
+        revalue = bool(topics & {"account", "prices"})
+        return (
+            self.trader.get_portfolio_value() if revalue else gr.update(),
+            self.trader.get_portfolio_value_chart() if "chart" in topics else gr.update(),
+            self.trader.get_logs() if "logs" in topics else gr.update(),
+            self.trader.get_holdings_df() if revalue else gr.update(),
+            self.trader.get_transactions_df() if "account" in topics else gr.update(),
         )
-        log_timer = gr.Timer(value=0.5)
-        log_timer.tick(
-            fn=self.trader.get_logs,
-            inputs=[self.log],
-            outputs=[self.log],
-            show_progress="hidden",
-            queue=False,
+
+    async def stream_updates(self):
+        """
+        Push updates to the browser as this trader's data changes in the database.
+        Prices move without any write, so the portfolio value is also refreshed every REVALUE_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        name = self.trader.name.lower()
+
+        def on_change(changes):
+            topics = {topic for changed_name, topic in changes if changed_name == name}
+            if topics:
+                loop.call_soon_threadsafe(queue.put_nowait, topics)
+
+        watcher.subscribe(on_change)
+        try:
+            while True:
+                try:
+                    topics = await asyncio.wait_for(queue.get(), timeout=REVALUE_SECONDS)
+                except asyncio.TimeoutError:
+                    topics = {"prices"}
+                while not queue.empty():
+                    topics |= queue.get_nowait()
+                yield await asyncio.to_thread(self.refresh, topics)
+        finally:
+            watcher.unsubscribe(on_change)
+
+
+class MetricsView:
+    """Latency and cost per trader and model, and the models and MCP tools that take the most time"""
+
+    run_columns = ["Trader", "Model", "Runs", "Errors", "p50 (s)", "p95 (s)", "Tokens In", "Tokens Out", "Cost ($)"]
+    span_columns = ["Kind", "Model / Tool", "Calls", "Total (s)", "Share", "p50 (ms)", "p95 (ms)"]
+
+    def __init__(self):
+        self.runs_table = None
+        self.spans_table = None
+
+    def get_runs_df(self) -> pd.DataFrame:
+        rows = run_summary(since_hours(METRICS_WINDOW_HOURS))
+        return pd.DataFrame(
+            [
+                [
+                    row["trader"].title(),
+                    row["model"],
+                    row["runs"],
+                    row["errors"],
+                    round(row["p50_s"] or 0, 1),
+                    round(row["p95_s"] or 0, 1),
+                    row["input_tokens"],
+                    row["output_tokens"],
+                    round(row["cost"], 4),
+                ]
+                for row in rows
+            ],
+            columns=self.run_columns,
         )
 
-    def refresh(self):
-        self.trader.reload()
-        return (
-            self.trader.get_portfolio_value(),
-            self.trader.get_portfolio_value_chart(),
-            self.trader.get_holdings_df(),
-            self.trader.get_transactions_df(),
+    def get_spans_df(self) -> pd.DataFrame:
+        rows = span_summary(since_hours(METRICS_WINDOW_HOURS))
+        return pd.DataFrame(
+            [
+                [
+                    row["kind"],
+                    row["label"],
+                    row["calls"],
+                    round(row["total_s"], 1),
+                    f"{row['share']:.0%}",
+                    round(row["p50_ms"] or 0),
+                    round(row["p95_ms"] or 0),
+                ]
+                for row in rows
+            ],
+            columns=self.span_columns,
         )
 
+    def make_ui(self):
+        with gr.Row():
+            self.runs_table = gr.Dataframe(
+                value=self.get_runs_df,
+                label=f"Runs in the last {METRICS_WINDOW_HOURS:g} hours",
+                headers=self.run_columns,
+                col_count=len(self.run_columns),
+                max_height=300,
+            )
+            self.spans_table = gr.Dataframe(
+                value=self.get_spans_df,
+                label="Where the time goes",
+                headers=self.span_columns,
+                col_count=len(self.span_columns),
+                max_height=300,
+            )
+
+    def outputs(self) -> list:
+        return [self.runs_table, self.spans_table]
+
+    async def stream_updates(self):
+        """Refresh the tables whenever a trader run finishes"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def on_change(changes):
+            if any(topic == "metrics" for _, topic in changes):
+                loop.call_soon_threadsafe(queue.put_nowait, True)
+
+        watcher.subscribe(on_change)
+        try:
+            while True:
+                await queue.get()
+                while not queue.empty():
+                    queue.get_nowait()
+                yield await asyncio.to_thread(lambda: (self.get_runs_df(), self.get_spans_df()))
+        finally:
+            watcher.unsubscribe(on_change)
+
 
 # Main UI construction
 def create_ui():
     """Create the main Gradio UI for the trading simulation"""
 
+    # The trading floor seeds the registry and syncs it with TRADERS_CONFIG; the dashboard only reads it
     traders = [
-        Trader(trader_name, lastname, model_name)
-        for trader_name, lastname, model_name in zip(names, lastnames, short_model_names)
+        Trader(config["name"], config["lastname"], config["short_model_name"])
+        for config in read_traders()[:DASHBOARD_MAX_TRADERS]
     ]
     trader_views = [TraderView(trader) for trader in traders]
+    metrics_view = MetricsView()
 
     with gr.Blocks(
         title="Traders", css=css, js=js, theme=gr.themes.Default(primary_hue="sky"), fill_width=True
     ) as ui:
-        with gr.Row():
-            for trader_view in trader_views:
-                trader_view.make_ui()
+        if not trader_views:
+            gr.Markdown("No traders are registered yet. Start the trading floor, then reload this page.")
+        for i in range(0, len(trader_views), TRADERS_PER_ROW):
+            with gr.Row():
+                for trader_view in trader_views[i : i + TRADERS_PER_ROW]:
+                    trader_view.make_ui()
+        metrics_view.make_ui()
+        ui.load(
+            metrics_view.stream_updates,
+            outputs=metrics_view.outputs(),
+            show_progress="hidden",
+            concurrency_limit=None,
+        )
+        for trader_view in trader_views:
+            ui.load(
+                trader_view.stream_updates,
+                outputs=trader_view.outputs(),
+                show_progress="hidden",
+                concurrency_limit=None,
+            )
 
     return ui
 
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Workers are started with spawn and import the accounts modules only after ACCOUNTS_DB points at
+# their own scratch database, so a backtest never touches the live accounts.
+
+DEFAULT_UNIVERSE = [
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BRK.B", "JPM", "V",
+    "XOM", "UNH", "JNJ", "PG", "KO", "SPY", "QQQ", "TLT", "GLD", "IBIT",
+]
+TRADING_DAYS_PER_YEAR = 252
+
+
+@dataclass
+class BacktestResult:
+    name: str
+    equity_curve: list[tuple[str, float]]
+    trades: int
+    seconds: float
+    stats: dict[str, float] = field(default_factory=dict)
+
+
+class StubModel:
+    """
+    A deterministic stand-in for the trader's LLM.
+    It reads the strategy text once to pick momentum or mean reversion, then each day holds the
+    best-ranked few symbols of its universe. Its choices depend only on the seed and the prices.
+    """
+
+    MOMENTUM_WORDS = ("aggressive", "bold", "momentum", "disruptive", "rapid")
+
+    def __init__(self, name: str, strategy: str, seed: int = 0, positions: int = 3, trade_probability: float = 0.5):
+        self.rng = random.Random(f"{seed}:{name}")
+        self.momentum = any(word in strategy.lower() for word in self.MOMENTUM_WORDS)
+        self.positions = positions
+        self.trade_probability = trade_probability
+
+    def decide(self, holdings: dict[str, int], balance: float, previous: dict[str, float], prices: dict[str, float]) -> list[tuple[str, str, int]]:
+        """Return (side, symbol, quantity) orders, sells first"""
+        returns = {
+            symbol: price / previous[symbol] - 1
+            for symbol, price in prices.items()
+            if price and previous.get(symbol)
+        }
+        if not returns or self.rng.random() > self.trade_probability:
+            return []
+        ranked = sorted(returns, key=lambda symbol: (returns[symbol], symbol), reverse=self.momentum)
+        targets = ranked[: self.positions]
+        orders = [("sell", symbol, quantity) for symbol, quantity in holdings.items() if symbol not in targets]
+        cash = balance + sum(prices.get(symbol, 0.0) * quantity for _, symbol, quantity in orders)
+        new_targets = [symbol for symbol in targets if symbol not in holdings]
+        for symbol in new_targets:
+            quantity = int(cash * 0.95 / len(new_targets) / prices[symbol])
+            if quantity > 0:
+                orders.append(("buy", symbol, quantity))
+        return orders
+
+
+def calculate_stats(equity_curve: list[tuple[str, float]]) -> dict[str, float]:
+    values = [value for _, value in equity_curve]
+    if len(values) < 2:
+        return {}
+    returns = [after / before - 1 for before, after in zip(values, values[1:]) if before]
+    peak, max_drawdown = values[0], 0.0
+    for value in values:
+        peak = max(peak, value)
+        max_drawdown = max(max_drawdown, 1 - value / peak)
+    deviation = statistics.pstdev(returns) if len(returns) > 1 else 0.0
+    return {
+        "final_value": values[-1],
+        "profit_loss": values[-1] - values[0],
+        "total_return": values[-1] / values[0] - 1,
+        "max_drawdown": max_drawdown,
+        "sharpe": statistics.mean(returns) / deviation * TRADING_DAYS_PER_YEAR**0.5 if deviation else 0.0,
+    }
+
+
+async def replay(name: str, strategy: str, dates: list[str], universe: list[str], seed: int) -> BacktestResult:
+    """Drive one trader through the accounts server tools, one simulated trading day per snapshot"""
+    import accounts_server
+    import clock
+    from accounts import Account
+    from market import get_share_prices
+
+    start = time.perf_counter()
+    Account.get(name).reset(strategy)
+    model = StubModel(name, strategy, seed)
+    equity_curve, trades, previous = [], 0, {}
+    for date in dates:
+        with clock.simulated_time(datetime.strptime(date, "%Y-%m-%d").replace(hour=16)):
+            prices = get_share_prices(universe)
+            holdings = await accounts_server.get_holdings(name)
+            balance = await accounts_server.get_balance(name)
+            for side, symbol, quantity in model.decide(holdings, balance, previous, prices):
+                tool = accounts_server.buy_shares if side == "buy" else accounts_server.sell_shares
+                try:
+                    await tool(name, symbol, quantity, f"Backtest {side} on {date}")
+                    trades += 1
+                except ValueError as e:
+                    print(f"{name} {date}: {e}")
+            equity_curve.append((date, Account.get(name).calculate_portfolio_value()))
+            previous = prices
+    result = BacktestResult(name, equity_curve, trades, time.perf_counter() - start)
+    result.stats = calculate_stats(equity_curve)
+    return result
+
+
+def run_backtest(name: str, strategy: str, dates: list[str], universe: list[str], seed: int = 0) -> BacktestResult:
+    return asyncio.run(replay(name, strategy, dates, universe, seed))
+
+
+def _init_worker(directory: str) -> None:
+    os.environ["ACCOUNTS_DB"] = os.path.join(directory, f"backtest-{os.getpid()}.db")
+
+
+def run_backtests(strategies: dict[str, str], dates: list[str], universe: list[str], workers: int, seed: int = 0) -> list[BacktestResult]:
+    """Backtest each strategy in its own process, each worker with its own scratch database"""
+    with tempfile.TemporaryDirectory() as directory:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(directory,),
+        ) as pool:
+            futures = [
+                pool.submit(run_backtest, name, strategy, dates, universe, seed)
+                for name, strategy in strategies.items()
+            ]
+            return [future.result() for future in futures]
+
+
+def write_equity_curves(results: list[BacktestResult], path: str) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date"] + [result.name for result in results])
+        for i, (date, _) in enumerate(results[0].equity_curve):
+            writer.writerow([date] + [round(result.equity_curve[i][1], 2) for result in results])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the trader strategies against recorded EOD snapshots")
+    parser.add_argument("--start", default="0000-00-00")
+    parser.add_argument("--end", default="9999-99-99")
+    parser.add_argument("--universe", default=",".join(DEFAULT_UNIVERSE))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the equity curves to this CSV file")
+    args = parser.parse_args()
+
+    from eod_store import import_market_table, snapshot_dates
+    from reset import waren_strategy, george_strategy, ray_strategy, cathie_strategy
+
+    import_market_table()
+    dates = [date for date in snapshot_dates() if args.start <= date <= args.end]
+    if len(dates) < 2:
+        print("Need at least two recorded market snapshots in the date range to backtest")
+        print("To backtest without market data, record simulated ones: python market_simulator.py snapshots --start ... --end ...")
+        return
+    strategies = {"Warren": waren_strategy, "George": george_strategy, "Ray": ray_strategy, "Cathie": cathie_strategy}
+    start = time.perf_counter()
+    results = run_backtests(strategies, dates, args.universe.split(","), args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(dates)} days for {len(results)} traders in {elapsed:.1f}s")
+    for result in results:
+        stats = result.stats
+        print(
+            f"{result.name:>8}: value ${stats['final_value']:,.0f}  P&L ${stats['profit_loss']:,.0f}  "
+            f"return {stats['total_return']:.1%}  max drawdown {stats['max_drawdown']:.1%}  "
+            f"sharpe {stats['sharpe']:.2f}  trades {result.trades}  ({len(dates) / result.seconds:,.0f} days/s)"
+        )
+    if args.output:
+        write_equity_curves(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
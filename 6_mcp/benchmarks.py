@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:,.0f}/s ({seconds * 1000 / n:.3f} ms each)"
+
+
+def benchmark_database(n: int):
+    """Log writes per second: a fresh connection per write (the old behaviour) against the shared WAL connection"""
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = os.path.join(tmp, "before.db")
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "after.db")
+        import database
+
+        with sqlite3.connect(before_db) as conn:
+            conn.execute(
+                "CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT)"
+            )
+
+        def write_log_before(name: str, type: str, message: str):
+            with sqlite3.connect(before_db) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), ?, ?)",
+                    (name.lower(), type, message),
+                )
+                conn.commit()
+
+        for label, write in [("before", write_log_before), ("after", database.write_log)]:
+            start = time.perf_counter()
+            for i in range(n):
+                write("bench", "function", f"Started function lookup_share_price {i}")
+            print(f"write_log {label:>6}: {rate(n, time.perf_counter() - start)}")
+
+
+async def benchmark_accounts_client(n: int, name: str):
+    """Latency of reading the strategy resource: a new server per call (the old behaviour), a persistent session, and in-process"""
+    import mcp
+    from mcp.client.stdio import stdio_client
+    import accounts_client
+
+    async def read_strategy_resource_before(name):
+        async with stdio_client(accounts_client.params) as streams:
+            async with mcp.ClientSession(*streams) as session:
+                await session.initialize()
+                result = await session.read_resource(f"accounts://strategy/{name}")
+                return result.contents[0].text
+
+    async def time_calls(label, read):
+        start = time.perf_counter()
+        for _ in range(n):
+            await read(name)
+        seconds = time.perf_counter() - start
+        print(f"read_strategy_resource {label:>10}: {seconds * 1000 / n:.2f} ms per call")
+
+    await time_calls("before", read_strategy_resource_before)
+    await accounts_client.client.connect()
+    await time_calls("persistent", accounts_client.read_strategy_resource)
+    await accounts_client.client.close()
+    import accounts_server  # noqa: F401
+    await time_calls("in-process", accounts_client.read_strategy_resource)
+
+
+async def floor_cycle(names: list[str], latency: float, workers: int):
+    """One scheduler cycle over these traders, with the model call replaced by a sleep of `latency` seconds"""
+    import accounts_client
+    from scheduler import Scheduler
+
+    async def run(name):
+        await accounts_client.read_accounts_resource(name)
+        await accounts_client.read_strategy_resource(name)
+        await asyncio.sleep(latency)
+        await accounts_client.call_accounts_tool(
+            "buy_shares", {"name": name, "symbol": "AAPL", "quantity": 1, "rationale": "Benchmark"}
+        )
+
+    scheduler = Scheduler(share=1 / workers)
+    for name in names:
+        scheduler.add(name, 0, "openai")
+    await scheduler.run_cycle(run)
+
+
+def run_floor_cycle(names: list[str], latency: float, workers: int):
+    asyncio.run(floor_cycle(names, latency, workers))
+
+
+def benchmark_floor(trader_counts: list[int], worker_counts: list[int], latency: float, concurrency: int):
+    """Wall time of one trading floor cycle as the number of traders and worker processes grows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Spawned workers inherit these: a scratch database, in-process account calls and no rate budget
+        os.environ["ACCOUNTS_DB"] = os.path.join(tmp, "floor.db")
+        os.environ["ACCOUNTS_CLIENT_IN_PROCESS"] = "true"
+        os.environ["MAX_CONCURRENT_TRADERS"] = str(concurrency)
+        os.environ["DEFAULT_RUNS_PER_MINUTE"] = "1000000"
+        # Imported only now, so that trading_floor's database and scheduler read the settings above
+        from trading_floor import shard
+
+        for workers in worker_counts:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for count in trader_counts:
+                    names = [f"Trader{i}" for i in range(count)]
+                    shards = [names for names in shard(names, workers) if names]
+                    # The first cycle creates the accounts and warms up the workers; time the second
+                    for _ in range(2):
+                        start = time.perf_counter()
+                        for future in [pool.submit(run_floor_cycle, names, latency, workers) for names in shards]:
+                            future.result()
+                        seconds = time.perf_counter() - start
+                    print(
+                        f"floor {count:>5} traders, {workers:>2} workers: {seconds:.2f}s per cycle "
+                        f"({seconds * 1000 / count:.1f} ms per trader)"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the trading floor")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    database_parser = subparsers.add_parser("database", help="log writes per second")
+    database_parser.add_argument("-n", type=int, default=2000)
+    client_parser = subparsers.add_parser("accounts_client", help="latency of accounts server calls")
+    client_parser.add_argument("-n", type=int, default=20)
+    client_parser.add_argument("--name", default="Warren")
+    floor_parser = subparsers.add_parser("floor", help="wall time of a trading floor cycle as traders are added")
+    floor_parser.add_argument("--traders", default="4,16,64,256", help="comma separated trader counts")
+    floor_parser.add_argument("--workers", default="1,4", help="comma separated worker process counts")
+    floor_parser.add_argument("--latency", type=float, default=0.5, help="seconds each simulated model call takes")
+    floor_parser.add_argument("--concurrency", type=int, default=64, help="MAX_CONCURRENT_TRADERS across all workers")
+    args = parser.parse_args()
+    if args.benchmark == "database":
+        benchmark_database(args.n)
+    elif args.benchmark == "accounts_client":
+        asyncio.run(benchmark_accounts_client(args.n, args.name))
+    elif args.benchmark == "floor":
+        benchmark_floor(
+            [int(n) for n in args.traders.split(",")],
+            [int(n) for n in args.workers.split(",")],
+            args.latency,
+            args.concurrency,
+        )
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+_simulated_now: datetime | None = None
+
+
+def now() -> datetime:
+    """The current time, or the simulated time while a backtest is replaying history"""
+    return _simulated_now or datetime.now()
+
+
+def is_simulated() -> bool:
+    return _simulated_now is not None
+
+
+def set_simulated_time(moment: datetime | None) -> None:
+    global _simulated_now
+    _simulated_now = moment
+
+
+@contextmanager
+def simulated_time(moment: datetime):
+    previous = _simulated_now
+    set_simulated_time(moment)
+    try:
+        yield
+    finally:
+        set_simulated_time(previous)
@@ -1,16 +1,277 @@
 import sqlite3
 import json
-from datetime import datetime
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
+LOG_RETENTION_ROWS = int(os.getenv("LOG_RETENTION_ROWS", "5000"))
+METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "30"))
+BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", "30"))
+STATEMENT_CACHE_SIZE = 256
 
+# Portfolio values are kept raw for the last couple of days, and as OHLC buckets at coarser
+# resolutions for longer, so the series stays a bounded size however long an account trades.
+# Each tier is (resolution, retention); a retention of None keeps the tier forever.
+SERIES_RAW_RETENTION = timedelta(hours=48)
+SERIES_TIERS = [("hour", timedelta(days=30)), ("day", timedelta(days=365)), ("week", None)]
+SERIES_MAX_POINTS = 300
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-with sqlite3.connect(DB) as conn:
+_local = threading.local()
+
+
+class StaleAccountError(RuntimeError):
+    """Raised when an account is saved over a newer version written by someone else"""
+
+
+def connect() -> sqlite3.Connection:
+    """
+    Return the connection shared by this thread, opening it on first use.
+
+    Connections are reused for the life of the thread (and reopened after a fork), so the
+    prepared statements cached by sqlite3 survive between calls. WAL journaling lets the
+    accounts server, the trading floor and the UI read while another process writes, and
+    the busy timeout makes a writer wait for the lock instead of failing.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DB, timeout=BUSY_TIMEOUT_SECONDS, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+@contextmanager
+def transaction():
+    """
+    Run the enclosed reads and writes as one SQLite transaction, committed on success and rolled back on error.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a read-modify-write inside it can't interleave with
+    another writer; other writers wait (up to the busy timeout) rather than fail. Nested uses join the
+    outer transaction.
+    """
+    conn = connect()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _migrate_json_accounts(cursor):
+    """Move accounts stored as a single JSON blob into the normalized tables"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(accounts)")]
+    if "account" not in columns:
+        return
+    cursor.execute("ALTER TABLE accounts RENAME TO accounts_json")
+    _create_account_tables(cursor)
+    for name, account_json in cursor.execute("SELECT name, account FROM accounts_json").fetchall():
+        account = json.loads(account_json)
+        cursor.execute(
+            "INSERT INTO accounts (name, balance, strategy) VALUES (?, ?, ?)",
+            (name, account["balance"], account["strategy"]),
+        )
+        cursor.executemany(
+            "INSERT INTO holdings (name, symbol, quantity) VALUES (?, ?, ?)",
+            [(name, symbol, quantity) for symbol, quantity in account["holdings"].items()],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+                for t in account["transactions"]
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)",
+            [(name, dt, value) for dt, value in account["portfolio_value_time_series"]],
+        )
+    cursor.execute("DROP TABLE accounts_json")
+
+
+def _add_missing_columns(cursor, table: str, columns: list[str]):
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for column in columns:
+        if column.split()[0] not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+
+def _create_account_tables(cursor):
+    # The running P&L aggregates and trade stats are NULL for accounts created before they existed; Account rebuilds them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            name TEXT PRIMARY KEY,
+            balance REAL,
+            strategy TEXT,
+            net_invested REAL,
+            realized_pnl REAL,
+            version INTEGER NOT NULL DEFAULT 0,
+            trade_count INTEGER,
+            buy_count INTEGER,
+            sell_count INTEGER,
+            first_trade TEXT,
+            last_trade TEXT
+        )
+    ''')
+    _add_missing_columns(
+        cursor,
+        "accounts",
+        [
+            "net_invested REAL",
+            "realized_pnl REAL",
+            "version INTEGER NOT NULL DEFAULT 0",
+            "trade_count INTEGER",
+            "buy_count INTEGER",
+            "sell_count INTEGER",
+            "first_trade TEXT",
+            "last_trade TEXT",
+        ],
+    )
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            avg_cost REAL,
+            PRIMARY KEY (name, symbol)
+        )
+    ''')
+    _add_missing_columns(cursor, "holdings", ["avg_cost REAL"])
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            price REAL,
+            timestamp TEXT,
+            rationale TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name ON transactions (name, id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            datetime TEXT,
+            value REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_name ON portfolio_values (name, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_datetime ON portfolio_values (name, datetime)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_value_buckets (
+            name TEXT,
+            resolution TEXT,
+            bucket TEXT,
+            first TEXT,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            PRIMARY KEY (name, resolution, bucket)
+        )
+    ''')
+
+
+def _bucket_start(timestamp: str, resolution: str) -> str:
+    start = datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(minute=0, second=0)
+    if resolution != "hour":
+        start = start.replace(hour=0)
+    if resolution == "week":
+        start -= timedelta(days=start.weekday())
+    return start.strftime(TIMESTAMP_FORMAT)
+
+
+def _add_portfolio_value(cursor, name: str, timestamp: str, value: float):
+    """Record a raw value, fold it into the bucket of every tier, and drop whatever has aged out"""
+    cursor.execute(
+        'INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)',
+        (name, timestamp, value),
+    )
+    latest = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    cutoff = (latest - SERIES_RAW_RETENTION).strftime(TIMESTAMP_FORMAT)
+    cursor.execute('DELETE FROM portfolio_values WHERE name = ? AND datetime < ?', (name, cutoff))
+    for resolution, retention in SERIES_TIERS:
+        cursor.execute('''
+            INSERT INTO portfolio_value_buckets (name, resolution, bucket, first, open, high, low, close)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name, resolution, bucket) DO UPDATE SET
+                high=max(high, excluded.high),
+                low=min(low, excluded.low),
+                close=excluded.close
+        ''', (name, resolution, _bucket_start(timestamp, resolution), timestamp, value, value, value, value))
+        if retention:
+            cutoff = _bucket_start((latest - retention).strftime(TIMESTAMP_FORMAT), resolution)
+            cursor.execute(
+                'DELETE FROM portfolio_value_buckets WHERE name = ? AND resolution = ? AND bucket < ?',
+                (name, resolution, cutoff),
+            )
+
+
+def _backfill_portfolio_buckets(cursor):
+    """Build the bucketed tiers for portfolio values recorded before they existed"""
+    if cursor.execute('SELECT 1 FROM portfolio_value_buckets LIMIT 1').fetchone():
+        return
+    rows = cursor.execute('SELECT name, datetime, value FROM portfolio_values ORDER BY name, datetime').fetchall()
+    cursor.execute('DELETE FROM portfolio_values')
+    for name, timestamp, value in rows:
+        _add_portfolio_value(cursor, name, timestamp, value)
+
+
+# Writes to these tables bump a version per (name, topic) in the changes table, so that readers
+# in any process can tell what changed without re-reading the tables themselves
+# (table, topic, condition): a write to the table bumps the topic's version for that name, if the condition holds
+CHANGE_TOPICS = [
+    ("accounts", "account", None),
+    ("transactions", "account", None),
+    ("portfolio_values", "chart", None),
+    ("logs", "logs", None),
+    ("metrics", "metrics", "NEW.kind = 'run'"),
+]
+
+
+def _create_change_tracking(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changes (
+            name TEXT,
+            topic TEXT,
+            version INTEGER,
+            PRIMARY KEY (name, topic)
+        )
+    ''')
+    for table, topic, condition in CHANGE_TOPICS:
+        for event in ["INSERT", "UPDATE"] if table == "accounts" else ["INSERT"]:
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS track_{table}_{event.lower()} AFTER {event} ON {table}
+                {f"WHEN {condition}" if condition else ""}
+                BEGIN
+                    INSERT INTO changes (name, topic, version) VALUES (NEW.name, '{topic}', 1)
+                    ON CONFLICT(name, topic) DO UPDATE SET version = version + 1;
+                END
+            ''')
+
+
+with connect() as conn:
     cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+    _create_account_tables(cursor)
+    _migrate_json_accounts(cursor)
+    _backfill_portfolio_buckets(cursor)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,27 +281,267 @@ with sqlite3.connect(DB) as conn:
             message TEXT
         )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_name ON logs (name, id)')
+    # One row per finished span, plus a "run" row per trader run with its token usage and tool calls
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            trace_id TEXT,
+            kind TEXT,
+            label TEXT,
+            model TEXT,
+            started TEXT,
+            duration_ms REAL,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            requests INTEGER,
+            tool_calls INTEGER,
+            error TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_metrics_kind ON metrics (kind, started)')
+    # The trader registry; run_every_n_minutes of NULL means the trading floor default
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS traders (
+            name TEXT PRIMARY KEY,
+            lastname TEXT,
+            model_name TEXT,
+            short_model_name TEXT,
+            run_every_n_minutes REAL,
+            enabled INTEGER DEFAULT 1
+        )
+    ''')
+    _create_change_tracking(cursor)
+    # Legacy JSON market snapshots, now only read so they can be imported into eod_store
     cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
     conn.commit()
 
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
+def write_account(name, account_dict, cursor=None) -> int:
+    """
+    Write the balance, strategy, holdings, running P&L aggregates and trade stats of an account.
+    Transactions and portfolio values are appended separately, so this costs the same however long the history is.
+
+    If account_dict has a version, the write only succeeds if the stored account is still at that version.
+    Pass the cursor of an open transaction() to make the write part of it.
+
+    Returns:
+        int: The account's new version
+
+    Raises:
+        StaleAccountError: If the account has been written since that version was read
+    """
+    if cursor is None:
+        with transaction() as cursor:
+            return write_account(name, account_dict, cursor)
+    name = name.lower()
+    cost_basis = account_dict.get("cost_basis", {})
+    version = account_dict.get("version")
+    cursor.execute('''
+        INSERT INTO accounts (
+            name, balance, strategy, net_invested, realized_pnl, version,
+            trade_count, buy_count, sell_count, first_trade, last_trade
+        )
+        VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            balance=excluded.balance,
+            strategy=excluded.strategy,
+            net_invested=excluded.net_invested,
+            realized_pnl=excluded.realized_pnl,
+            version=accounts.version + 1,
+            trade_count=excluded.trade_count,
+            buy_count=excluded.buy_count,
+            sell_count=excluded.sell_count,
+            first_trade=excluded.first_trade,
+            last_trade=excluded.last_trade
+        WHERE ? IS NULL OR accounts.version = ?
+    ''', (
+        name,
+        account_dict["balance"],
+        account_dict["strategy"],
+        account_dict.get("net_invested", 0.0),
+        account_dict.get("realized_pnl", 0.0),
+        account_dict.get("trade_count", 0),
+        account_dict.get("buy_count", 0),
+        account_dict.get("sell_count", 0),
+        account_dict.get("first_trade"),
+        account_dict.get("last_trade"),
+        version,
+        version,
+    ))
+    if cursor.rowcount == 0:
+        raise StaleAccountError(f"The account {name} was changed since it was read; reload it and try again")
+    cursor.execute('DELETE FROM holdings WHERE name = ?', (name,))
+    cursor.executemany(
+        'INSERT INTO holdings (name, symbol, quantity, avg_cost) VALUES (?, ?, ?, ?)',
+        [
+            (name, symbol, quantity, cost_basis.get(symbol))
+            for symbol, quantity in account_dict["holdings"].items()
+        ],
+    )
+    cursor.execute('SELECT version FROM accounts WHERE name = ?', (name,))
+    return cursor.fetchone()[0]
+
+def read_account(name, cursor=None):
+    """
+    Read the balance, strategy, holdings, running P&L aggregates and trade stats of an account, without its history.
+    Pass the cursor of an open transaction() to read inside it.
+
+    Returns:
+        dict | None: The account fields, or None if the account does not exist.
+            net_invested and trade_count are None if they have never been computed for this account.
+    """
+    if cursor is None:
+        with connect() as conn:
+            return read_account(name, conn.cursor())
+    name = name.lower()
+    cursor.execute(
+        '''
+        SELECT balance, strategy, net_invested, realized_pnl, version,
+               trade_count, buy_count, sell_count, first_trade, last_trade
+        FROM accounts WHERE name = ?
+        ''',
+        (name,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    cursor.execute('SELECT symbol, quantity, avg_cost FROM holdings WHERE name = ?', (name,))
+    holdings = cursor.fetchall()
+    return {
+        "name": name,
+        "balance": row[0],
+        "strategy": row[1],
+        "net_invested": row[2],
+        "realized_pnl": row[3] or 0.0,
+        "version": row[4],
+        "trade_count": row[5],
+        "buy_count": row[6],
+        "sell_count": row[7],
+        "first_trade": row[8],
+        "last_trade": row[9],
+        "holdings": {symbol: quantity for symbol, quantity, _ in holdings},
+        "cost_basis": {symbol: avg_cost for symbol, _, avg_cost in holdings if avg_cost is not None},
+    }
+
+def append_transaction(name: str, transaction: dict, cursor=None) -> None:
+    """Record a transaction; pass the cursor of an open transaction() to make it part of it"""
+    if cursor is None:
+        with connect() as conn:
+            return append_transaction(name, transaction, conn.cursor())
+    cursor.execute('''
+        INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        name.lower(),
+        transaction["symbol"],
+        transaction["quantity"],
+        transaction["price"],
+        transaction["timestamp"],
+        transaction["rationale"],
+    ))
+
+def read_transactions(name: str) -> list[dict]:
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+            WHERE name = ?
+            ORDER BY id
+        ''', (name.lower(),))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def read_recent_transactions(name: str, last_n: int, after_id: int = 0) -> list[dict]:
+    """The last_n most recent transactions with an id above after_id, oldest first, each with its id"""
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
+            SELECT * FROM (
+                SELECT id, symbol, quantity, price, timestamp, rationale FROM transactions
+                WHERE name = ? AND id > ?
+                ORDER BY id DESC
+                LIMIT ?
+            ) ORDER BY id
+        ''', (name.lower(), after_id, last_n))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def read_last_transaction_id(name: str) -> int:
+    """The id of the account's latest transaction, or 0; a single seek on the (name, id) index"""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(id) FROM transactions WHERE name = ?', (name.lower(),))
+        return cursor.fetchone()[0] or 0
+
+def count_transactions_since(name: str, after_id: int) -> int:
+    """How many transactions have an id above after_id; only those rows are read"""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM transactions WHERE name = ? AND id > ?', (name.lower(), after_id))
+        return cursor.fetchone()[0]
+
+def append_portfolio_value(name: str, timestamp: str, value: float) -> None:
+    with connect() as conn:
+        cursor = conn.cursor()
+        _add_portfolio_value(cursor, name.lower(), timestamp, value)
         conn.commit()
 
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
+def read_portfolio_series(name: str, since: str | None = None, max_points: int = SERIES_MAX_POINTS) -> list[tuple[str, float]]:
+    """
+    Read a chart-ready portfolio value series for a window, at the finest resolution that
+    still covers the whole window in at most max_points points.
+
+    Args:
+        name (str): The account name
+        since (str): The start of the window as "YYYY-MM-DD HH:MM:SS", or None for the whole history
+        max_points (int): The most points to return; the coarsest tier is thinned out if it has more
+
+    Returns:
+        list: A list of (datetime, value) tuples; bucketed tiers report each bucket's closing value
+    """
+    name = name.lower()
+    with connect() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+        first = cursor.execute('''
+            SELECT MIN(first) FROM portfolio_value_buckets WHERE name = ? AND resolution = ?
+        ''', (name, SERIES_TIERS[-1][0])).fetchone()[0]
+        latest = cursor.execute(
+            'SELECT MAX(datetime) FROM portfolio_values WHERE name = ?', (name,)
+        ).fetchone()[0]
+        if first is None or latest is None:
+            return []
+        start = max(since or first, first)
+        latest = datetime.strptime(latest, TIMESTAMP_FORMAT)
+        points = []
+        for resolution, retention in [("raw", SERIES_RAW_RETENTION)] + SERIES_TIERS:
+            if retention and (latest - retention).strftime(TIMESTAMP_FORMAT) > start:
+                continue
+            if resolution == "raw":
+                cursor.execute('''
+                    SELECT datetime, value FROM portfolio_values
+                    WHERE name = ? AND datetime >= ? ORDER BY datetime
+                ''', (name, start))
+            else:
+                cursor.execute('''
+                    SELECT bucket, close FROM portfolio_value_buckets
+                    WHERE name = ? AND resolution = ? AND bucket >= ? ORDER BY bucket
+                ''', (name, resolution, _bucket_start(start, resolution)))
+            points = cursor.fetchall()
+            if len(points) <= max_points:
+                return points
+        step = -(-len(points) // max_points)
+        return points[::-1][::step][::-1]
+
+def clear_account_history(name: str) -> None:
+    name = name.lower()
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM transactions WHERE name = ?', (name,))
+        cursor.execute('DELETE FROM portfolio_values WHERE name = ?', (name,))
+        cursor.execute('DELETE FROM portfolio_value_buckets WHERE name = ?', (name,))
+        conn.commit()
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
@@ -52,7 +553,7 @@ def write_log(name: str, type: str, message: str):
     """
     now = datetime.now().isoformat()
     
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO logs (name, datetime, type, message)
@@ -60,6 +561,21 @@ def write_log(name: str, type: str, message: str):
         ''', (name.lower(), type, message))
         conn.commit()
 
+def write_logs(records: list[tuple[str, str, str, str]]) -> None:
+    """
+    Write a batch of log entries to the logs table in a single transaction.
+
+    Args:
+        records (list): Tuples of (name, datetime, type, message), with datetime in UTC
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO logs (name, datetime, type, message)
+            VALUES (?, ?, ?, ?)
+        ''', [(name.lower(), dt, type, message) for name, dt, type, message in records])
+        conn.commit()
+
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
@@ -71,31 +587,166 @@ def read_log(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT datetime, type, message FROM logs 
             WHERE name = ? 
-            ORDER BY datetime DESC
+            ORDER BY id DESC
             LIMIT ?
         ''', (name.lower(), last_n))
         
         return reversed(cursor.fetchall())
 
-def write_market(date: str, data: dict) -> None:
-    data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
+def read_log_since(name: str, last_id: int = 0, last_n: int = 10):
+    """
+    Read the log entries for a given name written after last_id, newest last.
+
+    Args:
+        name (str): The name to retrieve logs for
+        last_id (int): The id of the last entry the caller has already seen
+        last_n (int): The maximum number of entries to return; the most recent are kept
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message)
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, datetime, type, message FROM logs
+            WHERE name = ? AND id > ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (name.lower(), last_id, last_n))
+        return cursor.fetchall()[::-1]
+
+def prune_logs(keep_last_n: int = LOG_RETENTION_ROWS) -> int:
+    """
+    Delete all but the most recent keep_last_n log entries for each name.
+
+    Returns:
+        int: The number of entries deleted
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        names = [row[0] for row in cursor.execute('SELECT DISTINCT name FROM logs')]
+        deleted = 0
+        for name in names:
+            cursor.execute('''
+                DELETE FROM logs
+                WHERE name = ? AND id <= (
+                    SELECT id FROM logs WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            ''', (name, name, keep_last_n))
+            deleted += cursor.rowcount
+        conn.commit()
+        return deleted
+
+METRICS_COLUMNS = [
+    "name", "trace_id", "kind", "label", "model", "started", "duration_ms",
+    "input_tokens", "output_tokens", "requests", "tool_calls", "error",
+]
+
+def write_metrics(records: list[tuple]) -> None:
+    """Write a batch of metrics records, each a tuple in the order of METRICS_COLUMNS"""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            f'INSERT INTO metrics ({", ".join(METRICS_COLUMNS)}) VALUES ({", ".join("?" * len(METRICS_COLUMNS))})',
+            records,
+        )
+        conn.commit()
+
+def read_metrics(kind: str | None = None, since: str | None = None) -> list[dict]:
+    """
+    Read metrics records, oldest first.
+
+    Args:
+        kind: Only records of this kind, e.g. "run", "generation", "function" or "mcp_tools"
+        since: Only records started at or after this "YYYY-MM-DD HH:MM:SS" (UTC)
+    """
+    conditions, parameters = [], []
+    if kind:
+        conditions.append("kind = ?")
+        parameters.append(kind)
+    if since:
+        conditions.append("started >= ?")
+        parameters.append(since)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {", ".join(METRICS_COLUMNS)} FROM metrics {where} ORDER BY id', parameters)
+        return [dict(zip(METRICS_COLUMNS, row)) for row in cursor.fetchall()]
+
+def prune_metrics(keep_days: int = METRICS_RETENTION_DAYS) -> int:
+    """Delete metrics older than keep_days, returning how many were deleted"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).strftime(TIMESTAMP_FORMAT)
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM metrics WHERE started < ?', (cutoff,))
+        conn.commit()
+        return cursor.rowcount
+
+def write_trader(trader: dict) -> None:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
+            INSERT INTO traders (name, lastname, model_name, short_model_name, run_every_n_minutes, enabled)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                lastname = excluded.lastname,
+                model_name = excluded.model_name,
+                short_model_name = excluded.short_model_name,
+                run_every_n_minutes = excluded.run_every_n_minutes,
+                enabled = excluded.enabled
+        ''', (
+            trader["name"],
+            trader.get("lastname", "Trader"),
+            trader["model_name"],
+            trader.get("short_model_name") or trader["model_name"],
+            trader.get("run_every_n_minutes"),
+            int(trader.get("enabled", True)),
+        ))
         conn.commit()
 
+def read_traders(enabled_only: bool = True) -> list[dict]:
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT name, lastname, model_name, short_model_name, run_every_n_minutes, enabled
+            FROM traders {"WHERE enabled = 1" if enabled_only else ""} ORDER BY rowid
+        ''')
+        columns = [column[0] for column in cursor.description]
+        return [{**dict(zip(columns, row)), "enabled": bool(row[-1])} for row in cursor.fetchall()]
+
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
         row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+        return json.loads(row[0]) if row else None
+
+def read_market_dates() -> list[str]:
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT date FROM market ORDER BY date')
+        return [row[0] for row in cursor.fetchall()]
+
+def read_data_version() -> int:
+    """
+    Return SQLite's data_version for this thread's connection, which changes whenever another
+    connection commits. Checking it reads no tables, so it is cheap enough to poll.
+    """
+    return connect().execute('PRAGMA data_version').fetchone()[0]
+
+def read_changes() -> dict[tuple[str, str], int]:
+    """
+    Read the current version of every tracked (name, topic).
+
+    Returns:
+        dict: Maps (name, topic) to a version that increases with every write; topics are "account", "chart", "logs" and "metrics"
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, topic, version FROM changes')
+        return {(name, topic): version for name, topic, version in cursor.fetchall()}
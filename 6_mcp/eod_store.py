@@ -0,0 +1,144 @@
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from collections import OrderedDict
+from dotenv import load_dotenv
+from database import read_market, read_market_dates
+
+load_dotenv(override=True)
+
+MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", "market_data")
+# Snapshots kept mapped at once; a replay walks through many dates but only looks at the latest few
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "8"))
+
+# File layout: header (magic, count, key width), then the sorted tickers as fixed-width
+# null-padded keys, then one little-endian float64 close price per ticker in the same order.
+MAGIC = b"EOD1"
+HEADER = struct.Struct("<4sII")
+PRICE = struct.Struct("<d")
+
+
+class EodSnapshot:
+    """
+    A read-only, memory-mapped end-of-day snapshot.
+    Looking up a symbol is a binary search over the mapped ticker index, so nothing is parsed up front.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.key_width = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an EOD snapshot")
+        self._prices_offset = HEADER.size + self.count * self.key_width
+
+    def _key(self, i: int) -> bytes:
+        start = HEADER.size + i * self.key_width
+        return self._map[start : start + self.key_width]
+
+    def _price(self, i: int) -> float:
+        return PRICE.unpack_from(self._map, self._prices_offset + i * PRICE.size)[0]
+
+    def _index(self, symbol: str) -> int | None:
+        key = symbol.encode().ljust(self.key_width, b"\0")
+        if len(key) > self.key_width:
+            return None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self._key(lo) == key else None
+
+    def get(self, symbol: str, default: float = 0.0) -> float:
+        i = self._index(symbol)
+        return default if i is None else self._price(i)
+
+    def __contains__(self, symbol: str) -> bool:
+        return self._index(symbol) is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def items(self):
+        for i in range(self.count):
+            yield self._key(i).rstrip(b"\0").decode(), self._price(i)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+_snapshots: OrderedDict[str, EodSnapshot] = OrderedDict()
+
+
+def snapshot_path(date: str) -> str:
+    return os.path.join(MARKET_DATA_DIR, f"eod-{date}.bin")
+
+
+def write_snapshot(date: str, prices: dict[str, float]) -> None:
+    """Write the snapshot for a date, replacing any existing one atomically"""
+    tickers = sorted((ticker.encode(), price) for ticker, price in prices.items() if price is not None)
+    key_width = max((len(ticker) for ticker, _ in tickers), default=1)
+    os.makedirs(MARKET_DATA_DIR, exist_ok=True)
+    path = snapshot_path(date)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(tickers), key_width))
+        f.write(b"".join(ticker.ljust(key_width, b"\0") for ticker, _ in tickers))
+        f.write(struct.pack(f"<{len(tickers)}d", *(price for _, price in tickers)))
+    os.replace(tmp_path, path)
+    stale = _snapshots.pop(date, None)
+    if stale:
+        stale.close()
+
+
+def open_snapshot(date: str) -> EodSnapshot | None:
+    """
+    Return the snapshot for a date, or None if there isn't one.
+    The most recently used snapshots stay mapped; the least recently used is unmapped once there are too many.
+    """
+    snapshot = _snapshots.get(date)
+    if snapshot is not None:
+        _snapshots.move_to_end(date)
+    elif os.path.exists(snapshot_path(date)):
+        snapshot = _snapshots[date] = EodSnapshot(snapshot_path(date))
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)[1].close()
+    return snapshot
+
+
+def snapshot_dates() -> list[str]:
+    if not os.path.isdir(MARKET_DATA_DIR):
+        return []
+    return sorted(
+        name[len("eod-") : -len(".bin")]
+        for name in os.listdir(MARKET_DATA_DIR)
+        if name.startswith("eod-") and name.endswith(".bin")
+    )
+
+
+def get_price_on(symbol: str, date: str) -> float:
+    """The price of a symbol from the latest snapshot taken on or before the date, or 0 if there is none"""
+    dates = snapshot_dates()
+    i = bisect_right(dates, date)
+    if i == 0:
+        return 0.0
+    return open_snapshot(dates[i - 1]).get(symbol)
+
+
+def import_market_table() -> int:
+    """Convert any snapshots still held as JSON in the market table; returns how many were converted"""
+    existing = set(snapshot_dates())
+    imported = 0
+    for date in read_market_dates():
+        if date not in existing:
+            write_snapshot(date, read_market(date))
+            imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    print(f"Imported {import_market_table()} snapshots into {MARKET_DATA_DIR}")
@@ -0,0 +1,78 @@
+import os
+import threading
+import weakref
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import urlparse
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "120"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "600"))
+
+
+class ConnectionStats:
+    """
+    Count requests and the connections that served them, per host.
+    A response on a connection that has served a request before was sent without a new TCP and TLS handshake.
+    Connections are remembered by weak reference, not id(), since ids of closed connections get reused.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._connections = defaultdict(int)
+        self._seen = weakref.WeakSet()
+
+    async def on_response(self, response: httpx.Response) -> None:
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self._requests[response.request.url.host] += 1
+            if stream is not None and stream not in self._seen:
+                self._seen.add(stream)
+                self._connections[response.request.url.host] += 1
+
+    def report(self) -> dict[str, dict[str, int | float]]:
+        with self._lock:
+            return {
+                host: {
+                    "requests": requests,
+                    "connections": self._connections[host],
+                    "reused": requests - self._connections[host],
+                    "reuse_rate": (requests - self._connections[host]) / requests,
+                }
+                for host, requests in self._requests.items()
+            }
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{host}: {stats['requests']} requests over {stats['connections']} connections ({stats['reuse_rate']:.0%} reused)"
+            for host, stats in self.report().items()
+        )
+
+
+connection_stats = ConnectionStats()
+
+
+@lru_cache(maxsize=None)
+def _get_http_client(host: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=10.0),
+        follow_redirects=True,
+        event_hooks={"response": [connection_stats.on_response]},
+    )
+
+
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """One keep-alive connection pool per API host, shared by every model client in this process that calls it"""
+    parsed = urlparse(base_url)
+    return _get_http_client(f"{parsed.scheme}://{parsed.netloc}")
@@ -1,9 +1,16 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
+import asyncio
 import os
+from collections import OrderedDict
 from datetime import datetime
-import random
-from database import write_market, read_market
+import threading
+import time
+from database import read_market
+import clock
+from eod_store import open_snapshot, write_snapshot, EodSnapshot
+from market_simulator import simulator
+from http_clients import get_http_client
 from functools import lru_cache
 from datetime import timezone
 
@@ -15,16 +22,87 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# Point the Polygon client somewhere else, such as `python market_simulator.py serve`
+POLYGON_BASE_URL = os.getenv("POLYGON_BASE_URL")
+POLYGON_URL = POLYGON_BASE_URL or "https://api.polygon.io"
+use_polygon = bool(polygon_api_key or POLYGON_BASE_URL)
+
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "60"))
+PRICE_CACHE_MAX_SIZE = int(os.getenv("PRICE_CACHE_MAX_SIZE", "4096"))
+MARKET_STATUS_TTL_SECONDS = float(os.getenv("MARKET_STATUS_TTL_SECONDS", "300"))
+
+
+class QuoteCache:
+    """A thread-safe cache of share prices that expire after ttl seconds, evicting the least recently used"""
+
+    def __init__(self, ttl: float = PRICE_CACHE_TTL_SECONDS, max_size: int = PRICE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._quotes: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, symbols) -> dict[str, float]:
+        now = time.monotonic()
+        prices = {}
+        with self._lock:
+            for symbol in symbols:
+                quote = self._quotes.get(symbol)
+                if quote is None:
+                    continue
+                price, expires = quote
+                if expires <= now:
+                    del self._quotes[symbol]
+                else:
+                    self._quotes.move_to_end(symbol)
+                    prices[symbol] = price
+        return prices
+
+    def put_many(self, prices: dict[str, float]) -> None:
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for symbol, price in prices.items():
+                self._quotes[symbol] = (price, expires)
+                self._quotes.move_to_end(symbol)
+            while len(self._quotes) > self.max_size:
+                self._quotes.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quotes.clear()
+
+
+quote_cache = QuoteCache()
+
+
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    """One Polygon client per process, so its HTTP connection pool is reused"""
+    if POLYGON_BASE_URL:
+        return RESTClient(polygon_api_key or "market-simulator", base=POLYGON_BASE_URL)
+    return RESTClient(polygon_api_key)
+
+
+_market_status = {"open": False, "expires": 0.0}
+_market_status_lock = threading.Lock()
+
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
-    market_status = client.get_market_status()
-    return market_status.market == "open"
+    """Whether the market is open, asking Polygon at most once every MARKET_STATUS_TTL_SECONDS"""
+    if not use_polygon:
+        return simulator.is_market_open()
+    with _market_status_lock:
+        if time.monotonic() < _market_status["expires"]:
+            return _market_status["open"]
+        client = get_client()
+        market_status = client.get_market_status()
+        _market_status["open"] = market_status.market == "open"
+        _market_status["expires"] = time.monotonic() + MARKET_STATUS_TTL_SECONDS
+        return _market_status["open"]
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -33,38 +111,113 @@ def get_all_share_prices_polygon_eod() -> dict[str, float]:
     return {result.ticker: result.close for result in results}
 
 
-@lru_cache(maxsize=2)
-def get_market_for_prior_date(today):
-    market_data = read_market(today)
-    if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
-    return market_data
+def get_market_for_prior_date(today) -> EodSnapshot:
+    snapshot = open_snapshot(today)
+    if snapshot is None:
+        market_data = read_market(today) or get_all_share_prices_polygon_eod()
+        write_snapshot(today, market_data)
+        snapshot = open_snapshot(today)
+    return snapshot
 
 
-def get_share_price_polygon_eod(symbol) -> float:
-    today = datetime.now().date().strftime("%Y-%m-%d")
+def get_share_prices_polygon_eod(symbols) -> dict[str, float]:
+    today = clock.now().date().strftime("%Y-%m-%d")
     market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
-
-
-def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
-    result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close or result.prev_day.close
-
-
-def get_share_price_polygon(symbol) -> float:
+    return {symbol: market_data.get(symbol, 0.0) for symbol in symbols}
+
+
+def get_share_prices_polygon_min(symbols) -> dict[str, float]:
+    """Look up every symbol with a single snapshot request; unknown symbols are priced at 0"""
+    results = get_client().get_snapshot_all("stocks", tickers=list(symbols))
+    prices = {
+        result.ticker: (result.min.close if result.min else None) or result.prev_day.close
+        for result in results
+    }
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+
+async def aget_share_prices_polygon_min(symbols) -> dict[str, float]:
+    """get_share_prices_polygon_min over the shared async HTTP client, so waiting on Polygon doesn't block the event loop"""
+    response = await get_http_client(POLYGON_URL).get(
+        f"{POLYGON_URL}/v2/snapshot/locale/us/markets/stocks/tickers",
+        params={"tickers": ",".join(symbols)},
+        headers={"Authorization": f"Bearer {polygon_api_key or 'market-simulator'}"},
+    )
+    response.raise_for_status()
+    prices = {
+        result["ticker"]: (result.get("min") or {}).get("c") or (result.get("prevDay") or {}).get("c")
+        for result in response.json().get("tickers") or []
+    }
+    return {symbol: prices.get(symbol) or 0.0 for symbol in symbols}
+
+
+def get_share_prices_polygon(symbols) -> dict[str, float]:
     if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
+        return get_share_prices_polygon_min(symbols)
     else:
-        return get_share_price_polygon_eod(symbol)
+        return get_share_prices_polygon_eod(symbols)
+
+
+def get_share_prices_replayed(symbols) -> dict[str, float]:
+    """Prices from the recorded snapshot for the simulated date; symbols that weren't recorded are priced at 0"""
+    snapshot = open_snapshot(clock.now().date().strftime("%Y-%m-%d"))
+    return {symbol: snapshot.get(symbol) if snapshot else 0.0 for symbol in symbols}
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """
+    Return the price of each symbol, fetching the ones not in the quote cache in one round-trip.
+    Without Polygon, or if it fails, prices come from the deterministic market simulator.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    prices = {}
+    if clock.is_simulated():
+        return get_share_prices_replayed(symbols)
+    if use_polygon:
+        prices = quote_cache.get_many(symbols)
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if missing:
+            try:
+                fetched = get_share_prices_polygon(missing)
+                quote_cache.put_many(fetched)
+                prices.update(fetched)
+            except Exception as e:
+                print(f"Was not able to use the polygon API due to {e}; using the market simulator")
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(simulator.prices(missing))
+    return prices
 
 
 def get_share_price(symbol) -> float:
-    if polygon_api_key:
+    return get_share_prices([symbol])[symbol]
+
+
+async def aget_share_prices(symbols) -> dict[str, float]:
+    """
+    The async version of get_share_prices. Live quotes are fetched with the async HTTP client; the end of day
+    snapshot, which is downloaded at most once a day and then read from disk, is loaded on a worker thread.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if clock.is_simulated() or not use_polygon:
+        return get_share_prices(symbols)
+    prices = quote_cache.get_many(symbols)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
         try:
-            return get_share_price_polygon(symbol)
+            if is_paid_polygon:
+                fetched = await aget_share_prices_polygon_min(missing)
+            else:
+                fetched = await asyncio.to_thread(get_share_prices_polygon_eod, missing)
+            quote_cache.put_many(fetched)
+            prices.update(fetched)
         except Exception as e:
-            print(f"Was not able to use the polygon API due to {e}; using a random number")
-    return float(random.randint(1, 100))
+            print(f"Was not able to use the polygon API due to {e}; using the market simulator")
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(simulator.prices(missing))
+    return prices
+
+
+async def aget_share_price(symbol) -> float:
+    return (await aget_share_prices([symbol]))[symbol]
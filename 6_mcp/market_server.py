@@ -1,5 +1,5 @@
 from mcp.server.fastmcp import FastMCP
-from market import get_share_price
+from market import aget_share_price
 
 mcp = FastMCP("market_server")
 
@@ -10,7 +10,7 @@ async def lookup_share_price(symbol: str) -> float:
     Args:
         symbol: the symbol of the stock
     """
-    return get_share_price(symbol)
+    return await aget_share_price(symbol)
 
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,225 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from dotenv import load_dotenv
+import clock
+
+load_dotenv(override=True)
+
+MARKET_SIM_SEED = int(os.getenv("MARKET_SIM_SEED", "42"))
+MARKET_SIM_DRIFT = float(os.getenv("MARKET_SIM_DRIFT", "0.07"))
+MARKET_SIM_VOLATILITY = float(os.getenv("MARKET_SIM_VOLATILITY", "0.3"))
+MARKET_SIM_EPOCH = os.getenv("MARKET_SIM_EPOCH", "2024-01-01")
+MARKET_SIM_STEP_SECONDS = int(os.getenv("MARKET_SIM_STEP_SECONDS", "60"))
+MARKET_SIM_TICKERS = int(os.getenv("MARKET_SIM_TICKERS", "2000"))
+
+WELL_KNOWN_TICKERS = [
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BRK.B", "JPM", "V",
+    "XOM", "UNH", "JNJ", "PG", "KO", "SPY", "QQQ", "TLT", "GLD", "IBIT",
+    "ETHA", "FBTC", "ARKK", "COIN", "MSTR", "AMD", "NFLX", "DIS", "BAC", "WMT",
+]
+DAYS_PER_YEAR = 365
+SECONDS_PER_DAY = 86400
+MARKET_OPEN_UTC = (14, 30)
+MARKET_CLOSE_UTC = (21, 0)
+
+
+class MarketSimulator:
+    """
+    Deterministic synthetic prices for any ticker, standing in for Polygon when there's no API key.
+
+    Each ticker follows its own geometric Brownian motion with daily steps, drawn from a generator seeded
+    with (seed, ticker), so a given seed always produces the same prices at the same moment. Between daily
+    closes the price follows a Brownian bridge that moves every MARKET_SIM_STEP_SECONDS. Prices depend only
+    on the time asked about, so they work equally for the live clock and a simulated one.
+    """
+
+    def __init__(
+        self,
+        seed: int = MARKET_SIM_SEED,
+        drift: float = MARKET_SIM_DRIFT,
+        volatility: float = MARKET_SIM_VOLATILITY,
+        epoch: str = MARKET_SIM_EPOCH,
+    ):
+        self.seed = seed
+        self.drift = drift
+        self.volatility = volatility
+        self.epoch = datetime.strptime(epoch, "%Y-%m-%d")
+        self._paths: dict[str, tuple[random.Random, float, list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _log_prices(self, symbol: str, day: int) -> tuple[float, float, float]:
+        """The ticker's daily volatility and log prices at the start and end of the given day since the epoch"""
+        with self._lock:
+            path = self._paths.get(symbol)
+            if path is None:
+                rng = random.Random(f"{self.seed}:{symbol}")
+                sigma = self.volatility * rng.uniform(0.5, 1.5) / math.sqrt(DAYS_PER_YEAR)
+                path = self._paths[symbol] = (rng, sigma, [math.log(rng.uniform(5, 500))])
+            rng, sigma, log_prices = path
+            mu = self.drift / DAYS_PER_YEAR - sigma**2 / 2
+            while len(log_prices) <= day + 1:
+                log_prices.append(log_prices[-1] + mu + sigma * rng.gauss(0, 1))
+            return sigma, log_prices[day], log_prices[day + 1]
+
+    def price(self, symbol: str, when: datetime | None = None) -> float:
+        when = when or clock.now()
+        if when.tzinfo:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        symbol = symbol.upper()
+        seconds = max(0.0, (when - self.epoch).total_seconds())
+        day, fraction = divmod(seconds / SECONDS_PER_DAY, 1)
+        sigma, start, end = self._log_prices(symbol, int(day))
+        step = int(seconds // MARKET_SIM_STEP_SECONDS)
+        noise = random.Random(f"{self.seed}:{symbol}:{step}").gauss(0, 1)
+        log_price = start + fraction * (end - start) + sigma * math.sqrt(fraction * (1 - fraction)) * noise
+        return round(math.exp(log_price), 2)
+
+    def prices(self, symbols, when: datetime | None = None) -> dict[str, float]:
+        when = when or clock.now()
+        return {symbol: self.price(symbol, when) for symbol in symbols}
+
+    def daily_bar(self, symbol: str, date: str) -> dict:
+        """A Polygon-shaped daily aggregate; the session runs from the open to the close, UTC"""
+        day = datetime.strptime(date, "%Y-%m-%d")
+        open_time = day.replace(hour=MARKET_OPEN_UTC[0], minute=MARKET_OPEN_UTC[1])
+        close_time = day.replace(hour=MARKET_CLOSE_UTC[0], minute=MARKET_CLOSE_UTC[1])
+        session = [self.price(symbol, open_time + (close_time - open_time) * i / 4) for i in range(5)]
+        volume = random.Random(f"{self.seed}:{symbol}:{date}:volume").randint(10_000, 10_000_000)
+        return {
+            "T": symbol,
+            "o": session[0],
+            "h": max(session),
+            "l": min(session),
+            "c": session[-1],
+            "v": volume,
+            "vw": round(sum(session) / len(session), 4),
+            "t": int(day.replace(tzinfo=timezone.utc).timestamp() * 1000),
+        }
+
+    def is_market_open(self, when: datetime | None = None) -> bool:
+        """Weekdays between the open and the close, UTC"""
+        when = when or clock.now()
+        if when.tzinfo:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        return when.weekday() < 5 and MARKET_OPEN_UTC <= (when.hour, when.minute) < MARKET_CLOSE_UTC
+
+    def previous_trading_day(self, when: datetime | None = None) -> str:
+        day = (when or clock.now()).date() - timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day.strftime("%Y-%m-%d")
+
+
+def tickers(count: int = MARKET_SIM_TICKERS) -> list[str]:
+    """The simulated universe: well-known tickers, padded out with synthetic ones to count"""
+    return WELL_KNOWN_TICKERS + [f"SIM{i:04d}" for i in range(max(0, count - len(WELL_KNOWN_TICKERS)))]
+
+
+simulator = MarketSimulator()
+
+
+def write_snapshots(start: str, end: str, symbols: list[str]) -> list[str]:
+    """Record the simulated close of every weekday from start to end into eod_store, for backtests"""
+    from eod_store import write_snapshot
+
+    dates = []
+    day, last = datetime.strptime(start, "%Y-%m-%d"), datetime.strptime(end, "%Y-%m-%d")
+    while day <= last:
+        if day.weekday() < 5:
+            date = day.strftime("%Y-%m-%d")
+            write_snapshot(date, {symbol: simulator.daily_bar(symbol, date)["c"] for symbol in symbols})
+            dates.append(date)
+        day += timedelta(days=1)
+    return dates
+
+
+class PolygonHandler(BaseHTTPRequestHandler):
+    """Serve the few Polygon REST endpoints that market.py uses, from the simulator"""
+
+    protocol_version = "HTTP/1.1"
+    routes = [
+        (re.compile(r"^/v1/marketstatus/now$"), "market_status"),
+        (re.compile(r"^/v2/aggs/ticker/(?P<ticker>[^/]+)/prev$"), "previous_close"),
+        (re.compile(r"^/v2/aggs/grouped/locale/us/market/stocks/(?P<date>[\d-]+)$"), "grouped_daily"),
+        (re.compile(r"^/v2/snapshot/locale/us/markets/stocks/tickers$"), "snapshot_all"),
+    ]
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        for pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                self.send_json(200, getattr(self, handler)(query, **match.groupdict()))
+                return
+        self.send_json(404, {"status": "NOT_FOUND", "message": f"No simulated endpoint for {url.path}"})
+
+    def send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+    def market_status(self, query):
+        return {"market": "open" if simulator.is_market_open() else "closed", "serverTime": clock.now().isoformat()}
+
+    def previous_close(self, query, ticker):
+        return {"status": "OK", "ticker": ticker, "results": [simulator.daily_bar(ticker, simulator.previous_trading_day())]}
+
+    def grouped_daily(self, query, date):
+        results = [simulator.daily_bar(ticker, date) for ticker in tickers()]
+        return {"status": "OK", "resultsCount": len(results), "results": results}
+
+    def snapshot_all(self, query):
+        symbols = query["tickers"].split(",") if query.get("tickers") else tickers()
+        now = clock.now()
+        previous = simulator.previous_trading_day(now)
+        snapshots = []
+        for symbol in symbols:
+            price = simulator.price(symbol, now)
+            prev_day = simulator.daily_bar(symbol, previous)
+            snapshots.append({
+                "ticker": symbol,
+                "min": {"c": price, "o": price, "h": price, "l": price, "v": 0},
+                "prevDay": prev_day,
+                "todaysChange": round(price - prev_day["c"], 4),
+                "todaysChangePerc": round((price / prev_day["c"] - 1) * 100, 4),
+            })
+        return {"status": "OK", "count": len(snapshots), "tickers": snapshots}
+
+
+def serve(host: str, port: int) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), PolygonHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="A local, deterministic stand-in for the Polygon market data API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="serve Polygon-shaped endpoints over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    snapshots_parser = subparsers.add_parser("snapshots", help="record simulated closes for backtests")
+    snapshots_parser.add_argument("--start", required=True)
+    snapshots_parser.add_argument("--end", required=True)
+    snapshots_parser.add_argument("--tickers", type=int, default=len(WELL_KNOWN_TICKERS))
+    args = parser.parse_args()
+    if args.command == "serve":
+        server = serve(args.host, args.port)
+        print(f"Simulating the market with seed {MARKET_SIM_SEED}; set POLYGON_BASE_URL=http://{args.host}:{args.port}")
+        server.serve_forever()
+    else:
+        dates = write_snapshots(args.start, args.end, tickers(args.tickers))
+        print(f"Recorded {len(dates)} simulated trading days")
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from agents.mcp import MCPServerStdio
+from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+
+
+class MCPServerPool:
+    """
+    Start the MCP servers once and hand them out to every trader run.
+
+    Servers are keyed by their params, so the stateless servers (accounts, push, market, fetch, brave)
+    are shared by all traders, while each trader gets its own memory server with its own database.
+    Servers are started, health-checked and stopped from the task that owns the pool, because
+    the stdio client must be closed from the task that opened it.
+    """
+
+    def __init__(self):
+        self.servers: dict[str, MCPServerStdio] = {}
+        self.params: dict[str, dict] = {}
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return json.dumps(params, sort_keys=True)
+
+    async def _start(self, key: str) -> MCPServerStdio:
+        server = MCPServerStdio(
+            self.params[key],
+            client_session_timeout_seconds=CLIENT_SESSION_TIMEOUT_SECONDS,
+            cache_tools_list=True,
+        )
+        await server.connect()
+        self.servers[key] = server
+        return server
+
+    async def add(self, params: dict) -> MCPServerStdio:
+        key = self.key(params)
+        if key not in self.servers:
+            self.params[key] = params
+            await self._start(key)
+        return self.servers[key]
+
+    async def start(self, trader_names: list[str]) -> None:
+        """Start the shared servers and one set of per-trader servers for each name"""
+        for params in trader_mcp_server_params:
+            await self.add(params)
+        for name in trader_names:
+            for params in researcher_mcp_server_params(name):
+                await self.add(params)
+
+    def running(self, params_list: list[dict]) -> list[MCPServerStdio]:
+        """The running servers for these params; one that failed to restart is left out until it is back"""
+        keys = [self.key(params) for params in params_list]
+        return [self.servers[key] for key in keys if key in self.servers]
+
+    def trader_servers(self) -> list[MCPServerStdio]:
+        return self.running(trader_mcp_server_params)
+
+    def researcher_servers(self, name: str) -> list[MCPServerStdio]:
+        return self.running(researcher_mcp_server_params(name))
+
+    async def health_check(self) -> None:
+        """Ping every server, restart the ones that don't answer, and try again to start any that failed to restart"""
+        for key in list(self.params):
+            server = self.servers.get(key)
+            try:
+                if server is None:
+                    raise RuntimeError("not running")
+                if not server.session:
+                    raise RuntimeError("not connected")
+                await asyncio.wait_for(server.session.send_ping(), HEALTH_CHECK_TIMEOUT_SECONDS)
+            except Exception as e:
+                print(f"Restarting MCP server {self.params[key]['args']} after failed health check: {e}")
+                if server is not None:
+                    # Runs skip the server until it is back, rather than being handed a dead one
+                    del self.servers[key]
+                    try:
+                        await server.cleanup()
+                    except Exception as e:
+                        print(f"Failed to clean up MCP server {self.params[key]['args']}: {e}")
+                try:
+                    await self._start(key)
+                except Exception as e:
+                    print(f"Failed to restart MCP server {self.params[key]['args']}: {e}")
+
+    async def close(self) -> None:
+        for server in reversed(list(self.servers.values())):
+            await server.cleanup()
+        self.servers.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from database import read_metrics
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "deepseek-chat": (0.27, 1.10),
+    "gemini-2.5-flash-preview-04-17": (0.15, 0.60),
+    "grok-3-mini-beta": (0.30, 0.50),
+}
+MODEL_KINDS = ("generation", "response")
+SPAN_KINDS = ("generation", "response", "function", "mcp_tools")
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """The q-th percentile (0-100) of the values, interpolating between the nearest ranks"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def cost(model: str | None, input_tokens: int | None, output_tokens: int | None) -> float:
+    input_price, output_price = MODEL_PRICES.get(model or "", (0.0, 0.0))
+    return ((input_tokens or 0) * input_price + (output_tokens or 0) * output_price) / 1_000_000
+
+
+def since_hours(hours: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def run_summary(since: str | None = None) -> list[dict]:
+    """
+    Latency percentiles, tokens and cost of trader runs, per trader and model.
+    Tokens are summed over every model call in the run's trace, so the researcher's calls are included.
+    """
+    traces = defaultdict(lambda: [0, 0, 0.0])
+    for kind in MODEL_KINDS:
+        for span in read_metrics(kind, since):
+            usage = traces[span["trace_id"]]
+            usage[0] += span["input_tokens"] or 0
+            usage[1] += span["output_tokens"] or 0
+            usage[2] += cost(span["model"], span["input_tokens"], span["output_tokens"])
+    groups = defaultdict(list)
+    for run in read_metrics("run", since):
+        groups[(run["name"], run["model"])].append(run)
+    summary = []
+    for (name, model), runs in sorted(groups.items()):
+        durations = [run["duration_ms"] / 1000 for run in runs if run["duration_ms"] is not None]
+        input_tokens = output_tokens = total_cost = 0
+        for run in runs:
+            if run["trace_id"] in traces:
+                run_input, run_output, run_cost = traces[run["trace_id"]]
+            else:
+                run_input, run_output = run["input_tokens"] or 0, run["output_tokens"] or 0
+                run_cost = cost(model, run_input, run_output)
+            input_tokens += run_input
+            output_tokens += run_output
+            total_cost += run_cost
+        summary.append({
+            "trader": name,
+            "model": model,
+            "runs": len(runs),
+            "errors": sum(1 for run in runs if run["error"]),
+            "p50_s": percentile(durations, 50),
+            "p95_s": percentile(durations, 95),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": total_cost,
+        })
+    return summary
+
+
+def span_summary(since: str | None = None) -> list[dict]:
+    """Time spent per model and per MCP server tool, most time first, to show what dominates a cycle"""
+    groups = defaultdict(list)
+    for kind in SPAN_KINDS:
+        for span in read_metrics(kind, since):
+            if span["duration_ms"] is not None:
+                groups[(kind, span["label"])].append(span["duration_ms"])
+    total = sum(sum(durations) for durations in groups.values()) or 1.0
+    summary = [
+        {
+            "kind": kind,
+            "label": label,
+            "calls": len(durations),
+            "total_s": sum(durations) / 1000,
+            "share": sum(durations) / total,
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+        }
+        for (kind, label), durations in groups.items()
+    ]
+    return sorted(summary, key=lambda row: row["total_s"], reverse=True)
@@ -0,0 +1,74 @@
+import os
+import threading
+from typing import Callable
+from dotenv import load_dotenv
+from database import read_changes, read_data_version
+
+load_dotenv(override=True)
+
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "0.5"))
+
+Subscriber = Callable[[set[tuple[str, str]]], None]
+
+
+class ChangeWatcher:
+    """
+    Publish the (name, topic) pairs that change in the database to in-process subscribers.
+
+    The accounts server, the trading floor and the tracer all write from other processes, so a single
+    background thread watches SQLite's data_version, which costs no table reads; only when it moves
+    are the per-(name, topic) versions read and compared. An idle dashboard therefore does close to no work.
+    Subscribers are called on the watcher thread with the set of pairs that changed.
+    """
+
+    def __init__(self, poll_seconds: float = CHANGE_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.subscribers: list[Subscriber] = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self.subscribers.append(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-watcher", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, changes: set[tuple[str, str]]) -> None:
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber(changes)
+            except Exception as e:
+                print(f"Change subscriber failed: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        data_version = read_data_version()
+        versions = read_changes()
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                latest_data_version = read_data_version()
+                if latest_data_version == data_version:
+                    continue
+                data_version = latest_data_version
+                latest = read_changes()
+                changes = {key for key, version in latest.items() if versions.get(key) != version}
+                versions = latest
+            except Exception as e:
+                print(f"Change watcher failed to read the database: {e}")
+                continue
+            if changes:
+                self.publish(changes)
+
+
+watcher = ChangeWatcher()
@@ -0,0 +1,117 @@
+import asyncio
+import math
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+MAX_CONCURRENT_TRADERS = int(os.getenv("MAX_CONCURRENT_TRADERS", "4"))
+DEFAULT_RUNS_PER_MINUTE = float(os.getenv("DEFAULT_RUNS_PER_MINUTE", "30"))
+# Comma separated provider=runs per minute, e.g. "openai=20,deepseek=5"
+PROVIDER_RUNS_PER_MINUTE = {
+    provider.strip(): float(rate)
+    for provider, rate in (
+        item.split("=") for item in os.getenv("PROVIDER_RUNS_PER_MINUTE", "").split(",") if "=" in item
+    )
+}
+# "run_once" runs a late trader immediately, once, then returns to its schedule; "skip" waits for the next slot
+MISSED_RUN_POLICY = os.getenv("MISSED_RUN_POLICY", "run_once").strip().lower()
+
+
+class RateBudget:
+    """A token bucket that lets at most `per_minute` runs start per minute, with bursts up to `burst`"""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = None
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self.updated is not None:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class Schedule:
+    trader: object
+    interval_seconds: float
+    provider: str
+
+
+class Scheduler:
+    """
+    Run each trader on its own cadence.
+
+    Every trader has its own loop, so a slow trader never delays the others. Run times sit on a fixed grid
+    (start + k * interval), so they don't drift by however long each run took. A global semaphore caps how
+    many traders run at once, and a rate budget per model provider spreads out the runs that hit the same API.
+    When the traders are split across processes, each scheduler is given its share of those limits.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_TRADERS,
+        missed_run_policy: str = MISSED_RUN_POLICY,
+        share: float = 1.0,
+    ):
+        self.share = share
+        self.semaphore = asyncio.Semaphore(max(1, math.ceil(max_concurrency * share)))
+        self.missed_run_policy = missed_run_policy
+        self.schedules: list[Schedule] = []
+        self.budgets: dict[str, RateBudget] = {}
+
+    def add(self, trader, interval_seconds: float, provider: str) -> None:
+        self.schedules.append(Schedule(trader, interval_seconds, provider))
+        if provider not in self.budgets:
+            self.budgets[provider] = RateBudget(PROVIDER_RUNS_PER_MINUTE.get(provider, DEFAULT_RUNS_PER_MINUTE) * self.share)
+
+    def next_slot(self, slot: float, interval: float, now: float) -> float:
+        """The next time to run, given the slot that just ran and the missed-run policy"""
+        slot += interval
+        if slot < now:
+            missed = math.ceil((now - slot) / interval)
+            if self.missed_run_policy == "skip":
+                slot += missed * interval
+            else:
+                slot += (missed - 1) * interval
+        return slot
+
+    async def run_one(self, schedule: Schedule, run: Callable[[object], Awaitable]) -> None:
+        # Wait for the provider's budget before taking a slot, so a throttled provider never holds slots others could use
+        await self.budgets[schedule.provider].acquire()
+        async with self.semaphore:
+            await run(schedule.trader)
+
+    async def run_schedule(
+        self,
+        schedule: Schedule,
+        run: Callable[[object], Awaitable],
+        should_run: Callable[[], Awaitable[bool]],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        slot = loop.time()
+        while True:
+            await asyncio.sleep(max(0.0, slot - loop.time()))
+            if await should_run():
+                await self.run_one(schedule, run)
+            slot = self.next_slot(slot, schedule.interval_seconds, loop.time())
+
+    async def run_cycle(self, run: Callable[[object], Awaitable]) -> None:
+        """Run every trader once, within the same limits"""
+        await asyncio.gather(*[self.run_one(schedule, run) for schedule in self.schedules])
+
+    async def run(self, run: Callable[[object], Awaitable], should_run: Callable[[], Awaitable[bool]]) -> None:
+        await asyncio.gather(*[self.run_schedule(schedule, run, should_run) for schedule in self.schedules])
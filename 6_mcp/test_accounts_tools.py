@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+# The accounts server is used in process, against a scratch database
+os.environ["ACCOUNTS_DB"] = os.path.join(tempfile.mkdtemp(), "accounts.db")
+os.environ["ACCOUNTS_CLIENT_IN_PROCESS"] = "true"
+
+from agents.strict_schema import ensure_strict_json_schema
+from accounts_client import get_accounts_tools_openai
+
+
+def strict_violations(schema: dict, path: str = "$") -> list[str]:
+    """Every object in the schema, including $defs, that OpenAI's strict mode would reject"""
+    violations = []
+    if schema.get("type") == "object":
+        if schema.get("additionalProperties") is not False:
+            violations.append(f"{path}: additionalProperties must be false")
+        if set(schema.get("required", [])) != set(schema.get("properties", {})):
+            violations.append(f"{path}: every property must be required")
+    for key, value in schema.items():
+        if isinstance(value, dict):
+            children = value.items() if key in ("$defs", "properties") else [(None, value)]
+            for name, child in children:
+                if isinstance(child, dict):
+                    violations += strict_violations(child, f"{path}.{key}" + (f".{name}" if name else ""))
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                if isinstance(child, dict):
+                    violations += strict_violations(child, f"{path}.{key}[{i}]")
+    return violations
+
+
+class TestAccountsToolSchemas(unittest.TestCase):
+    def setUp(self):
+        self.tools = asyncio.run(get_accounts_tools_openai())
+
+    def test_execute_orders_is_offered(self):
+        self.assertIn("execute_orders", [tool.name for tool in self.tools])
+
+    def test_every_schema_is_strict(self):
+        for tool in self.tools:
+            with self.subTest(tool=tool.name):
+                self.assertTrue(tool.strict_json_schema)
+                self.assertEqual(strict_violations(tool.params_json_schema), [])
+                ensure_strict_json_schema(tool.params_json_schema)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,20 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from database import write_logs, write_metrics
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import atexit
+import os
+import queue
 import secrets
 import string
+import threading
+import time
+
+load_dotenv(override=True)
 
 ALPHANUM = string.ascii_lowercase + string.digits 
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "0.5"))
 
 def make_trace_id(tag: str) -> str:
     """
@@ -15,25 +26,99 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+
+def trader_name(trace_id: str) -> str | None:
+    """The trader's name from a trace id made by make_trace_id, or None for other traces"""
+    name = trace_id.split("_")[1]
+    return name.split("0")[0] if "0" in name else None
+
+
+class BufferedLogSink:
+    """
+    Queue log records in memory and write them in batches from a background thread,
+    so that the agent's event loop never waits on SQLite.
+    A batch is written when it reaches batch_size records, or flush_seconds after its first record.
+    The writer is called with each batch; by default it writes to the logs table.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE, flush_seconds: float = LOG_FLUSH_SECONDS, writer=write_logs):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self.thread.start()
+        atexit.register(self.shutdown)
+
+    def write(self, name: str, type: str, message: str) -> None:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self.put((name, now, type, message))
+
+    def put(self, record: tuple) -> None:
+        self.queue.put(record)
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every record queued so far has been written"""
+        if self.thread.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait(timeout)
+
+    def shutdown(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+
+    def _write(self, batch: list) -> None:
+        try:
+            self.writer(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} log records: {e}")
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is self._STOP:
+                return
+
+
 class LogTracer(TracingProcessor):
 
+    def __init__(self, sink: BufferedLogSink | None = None):
+        self.sink = sink or BufferedLogSink()
+
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
-        trace_id = trace_or_span.trace_id
-        name = trace_id.split("_")[1]
-        if '0' in name:
-            return name.split("0")[0]
-        else:
-            return None
+        return trader_name(trace_or_span.trace_id)
 
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            self.sink.write(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            self.sink.write(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -49,7 +134,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.sink.write(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -66,10 +151,77 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.sink.write(name, type, message)
 
     def force_flush(self) -> None:
+        self.sink.flush()
+
+    def shutdown(self) -> None:
+        self.sink.shutdown()
+
+
+def parse_time(timestamp: str | None) -> datetime | None:
+    return datetime.fromisoformat(timestamp) if timestamp else None
+
+
+class MetricsTracer(TracingProcessor):
+    """
+    Record the duration of every finished span in the metrics table, with the model and token usage of
+    model calls, and the MCP server of tool calls, so slow servers and expensive models can be found with SQL.
+    """
+
+    def __init__(self, sink: BufferedLogSink | None = None):
+        self.sink = sink or BufferedLogSink(writer=write_metrics)
+
+    def record(self, name: str, trace_id: str, kind: str, label: str | None, started: datetime | None,
+               duration_ms: float | None, model: str | None = None, input_tokens: int | None = None,
+               output_tokens: int | None = None, requests: int | None = None, tool_calls: int | None = None,
+               error: str | None = None) -> None:
+        started = (started or datetime.now(timezone.utc)).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self.sink.put((
+            name, trace_id, kind, label, model, started, duration_ms,
+            input_tokens, output_tokens, requests, tool_calls, error,
+        ))
+
+    def on_trace_start(self, trace) -> None:
         pass
 
+    def on_trace_end(self, trace) -> None:
+        pass
+
+    def on_span_start(self, span) -> None:
+        pass
+
+    def on_span_end(self, span) -> None:
+        name = trader_name(span.trace_id)
+        if not name or not span.span_data:
+            return
+        data = span.span_data
+        started, ended = parse_time(span.started_at), parse_time(span.ended_at)
+        duration_ms = (ended - started).total_seconds() * 1000 if started and ended else None
+        label, model, input_tokens, output_tokens = getattr(data, "name", None), None, None, None
+        if data.type == "generation":
+            model = data.model
+            usage = data.usage or {}
+            input_tokens, output_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+            label = model
+        elif data.type == "response" and data.response is not None:
+            model = data.response.model
+            usage = data.response.usage
+            input_tokens, output_tokens = (usage.input_tokens, usage.output_tokens) if usage else (None, None)
+            label = model
+        elif data.type == "function" and getattr(data, "mcp_data", None):
+            label = f"{data.mcp_data.get('server')}.{data.name}"
+        elif data.type == "mcp_tools":
+            label = data.server
+        error = span.error.get("message") if span.error else None
+        self.record(name, span.trace_id, data.type, label, started, duration_ms, model, input_tokens, output_tokens, error=error)
+
+    def force_flush(self) -> None:
+        self.sink.flush()
+
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        self.sink.shutdown()
+
+
+metrics_tracer = MetricsTracer()
@@ -1,9 +1,19 @@
 from contextlib import AsyncExitStack
-from accounts_client import read_accounts_resource, read_strategy_resource
-from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
+from accounts_client import (
+    read_accounts_resource,
+    read_delta_resource,
+    read_strategy_resource,
+    read_summary_resource,
+)
+from tracers import make_trace_id, metrics_tracer
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace, set_default_openai_client, get_current_trace
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+import hashlib
+import time
 import os
 import json
 from agents.mcp import MCPServerStdio
@@ -15,6 +25,8 @@ from templates import (
     research_tool,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+from mcp_pool import MCPServerPool
+from http_clients import get_http_client
 
 load_dotenv(override=True)
 
@@ -22,46 +34,127 @@ deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
 google_api_key = os.getenv("GOOGLE_API_KEY")
 grok_api_key = os.getenv("GROK_API_KEY")
 openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+openai_api_key = os.getenv("OPENAI_API_KEY")
 
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 GROK_BASE_URL = "https://api.x.ai/v1"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 MAX_TURNS = 30
+# "delta" sends a summary on a trader's first run and only the changes after that; "summary" always sends a summary;
+# "full" sends the whole account with its entire transaction history, as before
+ACCOUNT_REPORT_MODE = os.getenv("ACCOUNT_REPORT_MODE", "delta").strip().lower()
+AGENT_CACHE_SIZE = 256
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+providers = {
+    "openrouter": (OPENROUTER_BASE_URL, openrouter_api_key),
+    "deepseek": (DEEPSEEK_BASE_URL, deepseek_api_key),
+    "grok": (GROK_BASE_URL, grok_api_key),
+    "gemini": (GEMINI_BASE_URL, google_api_key),
+    "openai": (OPENAI_BASE_URL, openai_api_key),
+}
 
 
-def get_model(model_name: str):
+def get_provider(model_name: str) -> str:
     if "/" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
+        return "openrouter"
     elif "deepseek" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
+        return "deepseek"
     elif "grok" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=grok_client)
+        return "grok"
     elif "gemini" in model_name:
-        return OpenAIChatCompletionsModel(model=model_name, openai_client=gemini_client)
+        return "gemini"
     else:
+        return "openai"
+
+
+@lru_cache(maxsize=None)
+def get_client(provider: str) -> AsyncOpenAI:
+    """One client per provider, sending its requests through the keep-alive connection pool for its host"""
+    base_url, api_key = providers[provider]
+    client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=get_http_client(base_url))
+    if provider == "openai":
+        # Models given by name, and trace exports, use the Agents SDK's default client
+        set_default_openai_client(client)
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_model(model_name: str):
+    provider = get_provider(model_name)
+    if provider == "openai":
+        if openai_api_key:
+            get_client(provider)
         return model_name
+    return OpenAIChatCompletionsModel(model=model_name, openai_client=get_client(provider))
+
+
+_agents: OrderedDict[tuple, object] = OrderedDict()
+
+
+def instructions_key(instructions) -> str:
+    """A hash of the instructions; for instructions built on every run, the function that builds them"""
+    if callable(instructions):
+        instructions = f"{instructions.__module__}.{instructions.__qualname__}"
+    return hashlib.sha256(instructions.encode()).hexdigest()
 
 
-async def get_researcher(mcp_servers, model_name) -> Agent:
-    researcher = Agent(
-        name="Researcher",
-        instructions=researcher_instructions(),
-        model=get_model(model_name),
-        mcp_servers=mcp_servers,
+def memoize(key: tuple, build, cache: bool):
+    """
+    Return the object cached under key, building it on first use; the least recently used are evicted.
+    Keys identify MCP servers and tools by id(), which stay unique because the cached agents hold them.
+    Only cache for servers from an MCPServerPool, which hands out the same servers run after run; servers
+    started for a single run are closed after it, so agents cached for them would never be used again.
+    """
+    if not cache:
+        return build()
+    if key in _agents:
+        _agents.move_to_end(key)
+        return _agents[key]
+    _agents[key] = value = build()
+    while len(_agents) > AGENT_CACHE_SIZE:
+        _agents.popitem(last=False)
+    return value
+
+
+def get_agent(name: str, instructions, model_name: str, mcp_servers, tools=(), cache: bool = False) -> Agent:
+    key = (
+        "agent",
+        name,
+        model_name,
+        instructions_key(instructions),
+        tuple(id(server) for server in mcp_servers),
+        tuple(id(tool) for tool in tools),
+    )
+    return memoize(
+        key,
+        lambda: Agent(
+            name=name,
+            instructions=instructions,
+            model=get_model(model_name),
+            tools=list(tools),
+            mcp_servers=list(mcp_servers),
+        ),
+        cache,
     )
-    return researcher
 
 
-async def get_researcher_tool(mcp_servers, model_name) -> Tool:
-    researcher = await get_researcher(mcp_servers, model_name)
-    return researcher.as_tool(tool_name="Researcher", tool_description=research_tool())
+async def get_researcher(mcp_servers, model_name, cache: bool = False) -> Agent:
+    # The instructions include the current time, so they are built for each run rather than baked into the cached agent
+    return get_agent(
+        "Researcher", lambda context, agent: researcher_instructions(), model_name, mcp_servers, cache=cache
+    )
+
+
+async def get_researcher_tool(mcp_servers, model_name, cache: bool = False) -> Tool:
+    researcher = await get_researcher(mcp_servers, model_name, cache)
+    return memoize(
+        ("tool", id(researcher)),
+        lambda: researcher.as_tool(tool_name="Researcher", tool_description=research_tool()),
+        cache,
+    )
 
 
 class Trader:
@@ -71,26 +164,30 @@ class Trader:
         self.agent = None
         self.model_name = model_name
         self.do_trade = True
+        self.last_transaction_id = None
 
-    async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
-        tool = await get_researcher_tool(researcher_mcp_servers, self.model_name)
-        self.agent = Agent(
-            name=self.name,
-            instructions=trader_instructions(self.name),
-            model=get_model(self.model_name),
-            tools=[tool],
-            mcp_servers=trader_mcp_servers,
+    async def create_agent(self, trader_mcp_servers, researcher_mcp_servers, cache: bool = False) -> Agent:
+        tool = await get_researcher_tool(researcher_mcp_servers, self.model_name, cache)
+        self.agent = get_agent(
+            self.name, trader_instructions(self.name), self.model_name, trader_mcp_servers, [tool], cache
         )
         return self.agent
 
     async def get_account_report(self) -> str:
-        account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        if ACCOUNT_REPORT_MODE == "full":
+            account = await read_accounts_resource(self.name)
+            account_json = json.loads(account)
+            account_json.pop("portfolio_value_time_series", None)
+            return json.dumps(account_json)
+        if ACCOUNT_REPORT_MODE == "delta" and self.last_transaction_id is not None:
+            account = await read_delta_resource(self.name, self.last_transaction_id)
+        else:
+            account = await read_summary_resource(self.name)
+        self.last_transaction_id = json.loads(account)["last_transaction_id"]
+        return account
 
-    async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
-        self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
+    async def run_agent(self, trader_mcp_servers, researcher_mcp_servers, cache: bool = False):
+        self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers, cache)
         account = await self.get_account_report()
         strategy = await read_strategy_resource(self.name)
         message = (
@@ -98,9 +195,39 @@ class Trader:
             if self.do_trade
             else rebalance_message(self.name, strategy, account)
         )
-        await Runner.run(self.agent, message, max_turns=MAX_TURNS)
+        started, start = datetime.now(timezone.utc), time.perf_counter()
+        result, error = None, None
+        try:
+            result = await Runner.run(self.agent, message, max_turns=MAX_TURNS)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self.record_run(started, time.perf_counter() - start, result, error)
+
+    def record_run(self, started: datetime, seconds: float, result, error: str | None):
+        """Add a row for this run to the metrics table, with the trader agent's own token usage and tool calls"""
+        usage = result.context_wrapper.usage if result else None
+        current_trace = get_current_trace()
+        metrics_tracer.record(
+            self.name.lower(),
+            current_trace.trace_id if current_trace else None,
+            "run",
+            "trading" if self.do_trade else "rebalancing",
+            started,
+            seconds * 1000,
+            model=self.model_name,
+            input_tokens=usage.input_tokens if usage else None,
+            output_tokens=usage.output_tokens if usage else None,
+            requests=usage.requests if usage else None,
+            tool_calls=sum(1 for item in result.new_items if item.type == "tool_call_item") if result else None,
+            error=error,
+        )
 
-    async def run_with_mcp_servers(self):
+    async def run_with_mcp_servers(self, pool: MCPServerPool | None = None):
+        if pool:
+            await self.run_agent(pool.trader_servers(), pool.researcher_servers(self.name), cache=True)
+            return
         async with AsyncExitStack() as stack:
             trader_mcp_servers = [
                 await stack.enter_async_context(
@@ -117,15 +244,15 @@ class Trader:
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_trace(self, pool: MCPServerPool | None = None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
         with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
+            await self.run_with_mcp_servers(pool)
 
-    async def run(self):
+    async def run(self, pool: MCPServerPool | None = None):
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(pool)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
         self.do_trade = not self.do_trade
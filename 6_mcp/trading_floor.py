@@ -1,9 +1,17 @@
-from traders import Trader
+from traders import Trader, get_provider
 from typing import List
 import asyncio
-from tracers import LogTracer
+import json
+import math
+import multiprocessing
+from tracers import LogTracer, metrics_tracer
 from agents import add_trace_processor
 from market import is_market_open
+from database import prune_logs, prune_metrics, read_traders, write_trader
+from accounts import Account
+from mcp_pool import MCPServerPool
+from scheduler import Scheduler
+from http_clients import connection_stats
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +21,11 @@ RUN_EVERY_N_MINUTES = int(os.getenv("RUN_EVERY_N_MINUTES", "60"))
 RUN_EVEN_WHEN_MARKET_IS_CLOSED = (
     os.getenv("RUN_EVEN_WHEN_MARKET_IS_CLOSED", "false").strip().lower() == "true"
 )
+TRADERS_CONFIG = os.getenv("TRADERS_CONFIG", "traders.json")
+FLOOR_WORKERS = int(os.getenv("FLOOR_WORKERS", "1"))
+# Each trader has its own memory server, so this bounds the number of MCP servers in one worker process
+MAX_TRADERS_PER_WORKER = int(os.getenv("MAX_TRADERS_PER_WORKER", "25"))
+HEALTH_CHECK_MINUTES = float(os.getenv("HEALTH_CHECK_MINUTES", "5"))
 USE_MANY_MODELS = os.getenv("USE_MANY_MODELS", "false").strip().lower() == "true"
 
 names = ["Warren", "George", "Ray", "Cathie"]
@@ -31,22 +44,122 @@ else:
     short_model_names = ["GPT 4o mini"] * 4
 
 
-def create_traders() -> List[Trader]:
+default_traders = [
+    {"name": name, "lastname": lastname, "model_name": model_name, "short_model_name": short_model_name}
+    for name, lastname, model_name, short_model_name in zip(names, lastnames, model_names, short_model_names)
+]
+
+
+def load_traders() -> List[dict]:
+    """
+    Return the enabled traders from the registry.
+    Traders listed in the TRADERS_CONFIG JSON file are added or updated first, and a new trader's
+    account is given the config's strategy; an empty registry is seeded with the default four.
+    """
+    if os.path.exists(TRADERS_CONFIG):
+        with open(TRADERS_CONFIG) as f:
+            for trader in json.load(f):
+                write_trader(trader)
+                account = Account.get(trader["name"])
+                if trader.get("strategy") and not account.strategy:
+                    account.reset(trader["strategy"])
+    elif not read_traders(enabled_only=False):
+        for trader in default_traders:
+            write_trader(trader)
+    return read_traders()
+
+
+def create_traders(configs: List[dict] | None = None) -> List[Trader]:
     traders = []
-    for name, lastname, model_name in zip(names, lastnames, model_names):
-        traders.append(Trader(name, lastname, model_name))
+    for config in configs if configs is not None else load_traders():
+        traders.append(Trader(config["name"], config["lastname"], config["model_name"]))
     return traders
 
 
-async def run_every_n_minutes():
+def run_interval_minutes(trader: Trader, config: dict | None = None) -> float:
+    """
+    The registry's interval for this trader, else RUN_EVERY_N_MINUTES_<NAME> (e.g. RUN_EVERY_N_MINUTES_WARREN),
+    else RUN_EVERY_N_MINUTES
+    """
+    if config and config.get("run_every_n_minutes"):
+        return float(config["run_every_n_minutes"])
+    return float(os.getenv(f"RUN_EVERY_N_MINUTES_{trader.name.upper()}", RUN_EVERY_N_MINUTES))
+
+
+def worker_count(trader_count: int) -> int:
+    return max(1, FLOOR_WORKERS, math.ceil(trader_count / MAX_TRADERS_PER_WORKER))
+
+
+def shard(configs: List[dict], workers: int) -> List[List[dict]]:
+    """Deal the traders round-robin across the workers, so each worker gets an even share"""
+    return [configs[i::workers] for i in range(workers)]
+
+
+async def should_run() -> bool:
+    if RUN_EVEN_WHEN_MARKET_IS_CLOSED:
+        return True
+    try:
+        if await asyncio.to_thread(is_market_open):
+            return True
+    except Exception as e:
+        print(f"Error checking the market status: {e}")
+    print("Market is closed, skipping run")
+    return False
+
+
+async def run_traders(configs: List[dict], workers: int = 1):
+    """Run these traders in this process, sharing one pool of MCP servers and one set of model clients"""
     add_trace_processor(LogTracer())
-    traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    add_trace_processor(metrics_tracer)
+    traders = create_traders(configs)
+    scheduler = Scheduler(share=1 / workers)
+    for trader, config in zip(traders, configs):
+        scheduler.add(trader, run_interval_minutes(trader, config) * 60, get_provider(trader.model_name))
+    async with MCPServerPool() as pool:
+        await pool.start([trader.name for trader in traders])
+        runs = asyncio.create_task(scheduler.run(lambda trader: trader.run(pool), should_run))
+        try:
+            # The pool's servers belong to this task, so it keeps them healthy while the scheduler runs the traders
+            while not runs.done():
+                await asyncio.wait([runs], timeout=HEALTH_CHECK_MINUTES * 60)
+                prune_logs()
+                prune_metrics()
+                await pool.health_check()
+                if connection_stats.report():
+                    print(f"Model API connections: {connection_stats.summary()}")
+            runs.result()
+        finally:
+            runs.cancel()
+
+
+def run_worker(configs: List[dict], workers: int):
+    asyncio.run(run_traders(configs, workers))
+
+
+async def run_every_n_minutes():
+    """
+    Run every trader in the registry. Above MAX_TRADERS_PER_WORKER traders (or with FLOOR_WORKERS set),
+    the traders are sharded across worker processes, each with its own MCP servers and scheduler;
+    accounts and memory stay per trader, so a trader behaves the same whichever worker runs it.
+    """
+    configs = load_traders()
+    workers = worker_count(len(configs))
+    if workers == 1:
+        await run_traders(configs)
+        return
+    print(f"Running {len(configs)} traders across {workers} worker processes")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(shard_configs, workers), name=f"trading-floor-{i}")
+        for i, shard_configs in enumerate(shard(configs, workers))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        await asyncio.gather(*[asyncio.to_thread(process.join) for process in processes])
+    finally:
+        for process in processes:
+            process.terminate()
 
 
 if __name__ == "__main__":